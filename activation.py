@@ -0,0 +1,74 @@
+"""
+Startup handshakes with whoever launched us, so nobody has to poll for the socket.
+
+  Socket activation   systemd (or any launcher speaking the same protocol) passes the
+                      already-listening Unix socket as fd 3 with LISTEN_FDS=1, LISTEN_PID=<pid>.
+  Readiness           READY=1 on $NOTIFY_SOCKET (systemd Type=notify), and/or one line
+                      "READY" written to the FIFO named by $KEYBOARDMOUSE_READY_FIFO
+                      (run_server.sh waits on that instead of polling).
+
+See systemd/ for example units.
+"""
+
+import logging
+import os
+import socket
+import threading
+
+log = logging.getLogger(__name__)
+
+SD_LISTEN_FDS_START = 3
+
+
+def listen_fds() -> list:
+    """Sockets passed by the launcher (LISTEN_FDS), as socket objects; [] if none.
+    The variables are cleared so child processes don't inherit them."""
+    try:
+        if int(os.environ.get("LISTEN_PID", "0")) != os.getpid():
+            return []
+        count = int(os.environ.get("LISTEN_FDS", "0"))
+    except ValueError:
+        return []
+    finally:
+        for name in ("LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES"):
+            os.environ.pop(name, None)
+    socks = []
+    for fd in range(SD_LISTEN_FDS_START, SD_LISTEN_FDS_START + count):
+        os.set_inheritable(fd, False)
+        socks.append(socket.socket(fileno=fd))
+    return socks
+
+
+def sd_notify(state: str) -> bool:
+    """Send a state string (e.g. "READY=1") to $NOTIFY_SOCKET. False if not run by systemd."""
+    addr = os.environ.get("NOTIFY_SOCKET")
+    if not addr:
+        return False
+    if addr.startswith("@"):
+        addr = "\0" + addr[1:]  # abstract namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            s.connect(addr)
+            s.sendall(state.encode("utf-8"))
+        return True
+    except OSError as e:
+        log.warning("sd_notify failed: %s", e)
+        return False
+
+
+def _write_fifo(path: str):
+    try:
+        # Blocks until the launcher opens the FIFO for reading
+        with open(path, "w") as f:
+            f.write("READY\n")
+    except OSError as e:
+        log.warning("Cannot signal readiness on %s: %s", path, e)
+
+
+def notify_ready(status: str = ""):
+    """Tell the launcher we accept connections: systemd notify socket and/or ready FIFO."""
+    sd_notify("READY=1" + (f"\nSTATUS={status}" if status else ""))
+    fifo = os.environ.pop("KEYBOARDMOUSE_READY_FIFO", "")
+    if fifo:
+        # In a thread: a launcher that went away must not block the server
+        threading.Thread(target=_write_fifo, args=(fifo,), daemon=True).start()
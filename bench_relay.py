@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Load test for the laptop data path without Bluetooth radios.
+
+  python bench_relay.py                 # relay -> user server -> null backend, all in-process
+  python bench_relay.py --relay-only    # relay -> byte sink: the relay's own per-chunk cost
+  python bench_relay.py --lines 200000 --chunk 20
+  python bench_relay.py --motion        # CPU cost of the SMOOTHING=1 stage per burst / tick
+
+The phone side is a LoopbackTransport socketpair (see transports.py); the user server runs
+with the null backend, which counts events instead of injecting them.
+"""
+
+import argparse
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import laptop_server
+from motion import MotionSmoother
+from transports import LoopbackTransport
+
+# Mix of what the app sends: mostly motion, some keys/clicks/scrolls
+MIX = ["MOVE:3,-2"] * 8 + ["KEY:a", "CLICK:left", "SCROLL:1", "KEY_DOWN:shift", "KEY_UP:shift"]
+SENTINEL = "KEY:bench_end"
+
+
+def _payload(lines, chunk):
+    """Yield byte chunks of `chunk` lines each, as the phone would write them."""
+    batch = []
+    for i in range(lines):
+        batch.append(MIX[i % len(MIX)])
+        if len(batch) == chunk:
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+            batch = []
+    batch.append(SENTINEL)
+    yield ("\n".join(batch) + "\n").encode("utf-8")
+
+
+def _start_relay(path):
+    os.environ["KEYBOARDMOUSE_SOCK"] = path
+    transport = LoopbackTransport()
+    threading.Thread(target=laptop_server.run_bt_relay, args=(transport,), daemon=True).start()
+    return transport
+
+
+def _wait_for(path):
+    for _ in range(100):
+        if os.path.exists(path):
+            return
+        time.sleep(0.01)
+    raise SystemExit(f"{path} was not created")
+
+
+def bench_pipeline(lines, chunk):
+    path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    os.environ["KEYBOARDMOUSE_SOCK"] = path
+    backend = laptop_server.NullBackend()
+    threading.Thread(target=laptop_server.run_user_server, args=(backend,), daemon=True).start()
+    _wait_for(path)
+    transport = _start_relay(path)
+
+    client = transport.connect()
+    start = time.perf_counter()
+    nbytes = 0
+    for data in _payload(lines, chunk):
+        client.sendall(data)
+        nbytes += len(data)
+    while backend.last != ("KEY", ["bench_end"]):
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    client.close()
+    transport.close()
+
+    print(f"pipeline: {lines} lines in {elapsed:.3f} s  ->  {lines / elapsed:,.0f} lines/s, "
+          f"{nbytes / elapsed / 1e6:.2f} MB/s")
+    print(f"  backend: {backend.events} events in {backend.batches} batches "
+          f"(coalescing {lines / max(backend.events, 1):.1f} lines/event)")
+
+
+def bench_relay_only(lines, chunk):
+    path = os.path.join(tempfile.mkdtemp(), "sink.sock")
+    sink = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sink.bind(path)
+    sink.listen(1)
+    received = [0]
+    done = threading.Event()
+    expected = sum(len(d) for d in _payload(lines, chunk))
+
+    def drain():
+        conn, _ = sink.accept()
+        while received[0] < expected:
+            data = conn.recv(65536)
+            if not data:
+                break
+            received[0] += len(data)
+        done.set()
+
+    threading.Thread(target=drain, daemon=True).start()
+    transport = _start_relay(path)
+    client = transport.connect()
+    chunks = 0
+    start = time.perf_counter()
+    for data in _payload(lines, chunk):
+        client.sendall(data)
+        chunks += 1
+    done.wait()
+    elapsed = time.perf_counter() - start
+    client.close()
+    transport.close()
+    print(f"relay only: {chunks} chunks, {received[0]} bytes in {elapsed:.3f} s  ->  "
+          f"{elapsed / chunks * 1e6:.1f} us/chunk, {received[0] / elapsed / 1e6:.2f} MB/s")
+
+
+def bench_motion(bursts):
+    """push() per burst and tick() per emitted frame, driven by a synthetic clock (no sleeping)."""
+    smoother = MotionSmoother.from_env(lambda dx, dy: None)
+    now = 1000.0
+    push_time = tick_time = 0.0
+    ticks = 0
+    for i in range(bursts):
+        start = time.perf_counter()
+        smoother.push(12, -7, now)
+        push_time += time.perf_counter() - start
+        # ~40 ms between Bluetooth bursts, emitted at the smoother's rate in between
+        end = now + 0.04
+        while now < end:
+            now += smoother.period
+            start = time.perf_counter()
+            smoother.tick(now)
+            tick_time += time.perf_counter() - start
+            ticks += 1
+    print(f"motion: push {push_time / bursts * 1e6:.2f} us/burst, tick {tick_time / ticks * 1e6:.2f} us/tick "
+          f"({ticks} ticks at {1 / smoother.period:.0f} Hz)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=100000, help="commands to send")
+    parser.add_argument("--chunk", type=int, default=10, help="commands per write (one RFCOMM packet)")
+    parser.add_argument("--relay-only", action="store_true", help="measure the relay alone")
+    parser.add_argument("--motion", action="store_true", help="measure the pointer smoothing stage")
+    opts = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)  # per-line INFO logs would dominate
+    if opts.motion:
+        bench_motion(opts.lines)
+    elif opts.relay_only:
+        bench_relay_only(opts.lines, opts.chunk)
+    else:
+        bench_pipeline(opts.lines, opts.chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+End-to-end check of the X11 input backends on a headless Xvfb display.
+
+  python bench_xvfb.py                          # every X11 backend that works here
+  python bench_xvfb.py --backends xdotool,pynput --samples 50
+
+For each backend this starts Xvfb and `laptop_server.py --user` with BACKEND=<name>, writes
+a scripted command mix into its Unix socket and watches the display from a second X
+connection: the pointer with XQueryPointer, keys and buttons as X events on a focused
+full-screen window. It reports inject-to-effect latency (command written -> effect seen),
+throughput, and wrong effects (inverted motion, wrong button, missing keys).
+
+Then, with MPX=1 (see mpx.py), two clients move the pointer in turn: each must move only
+its own XInput2 master, and the masters must be removed when the clients disconnect.
+
+Needs Xvfb (apt install xvfb) and python-xlib (pip install python-xlib); no real display
+or Bluetooth. ydotool is skipped: it injects through uinput, which Xvfb does not read.
+"""
+
+import argparse
+import os
+import select
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import laptop_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WIDTH, HEIGHT = 1280, 800
+TIMEOUT = 2.0  # seconds to wait for one effect before calling it missing
+
+# Backends that inject through the X server (new InputBackend classes are picked up here)
+X11_BACKENDS = [name for name in laptop_server.BACKENDS if name not in ("null", "ydotool")]
+
+# (command, expected X event): button numbers, and keysym names (compared as keysyms)
+CLICKS = [("CLICK:left", 1), ("CLICK:middle", 2), ("CLICK:right", 3), ("SCROLL:1", 4), ("SCROLL:-1", 5)]
+KEYS = [("KEY:a", "a"), ("KEY:z", "z"), ("KEY:enter", "Return"), ("KEY:space", "space"), ("KEY:backspace", "BackSpace")]
+MOVES = [(40, 0), (-40, 0), (0, 30), (0, -30), (25, 25), (-25, -25)]
+
+
+def start_xvfb():
+    """Start Xvfb on a free display number; returns (process, ':N')."""
+    r, w = os.pipe()
+    proc = subprocess.Popen(
+        ["Xvfb", "-displayfd", str(w), "-screen", "0", f"{WIDTH}x{HEIGHT}x24", "-nolisten", "tcp"],
+        pass_fds=(w,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    os.close(w)
+    with os.fdopen(r) as f:
+        number = f.readline().strip()
+    if not number:
+        proc.kill()
+        raise SystemExit("Xvfb did not start")
+    return proc, f":{number}"
+
+
+class Observer:
+    """Our own X connection with a focused full-screen window that receives the injected
+    keys and clicks."""
+
+    def __init__(self, display_name):
+        from Xlib import X, XK, display
+        self.X, self.XK = X, XK
+        self.d = display.Display(display_name)
+        screen = self.d.screen()
+        self.root = screen.root
+        self.win = self.root.create_window(
+            0, 0, WIDTH, HEIGHT, 0, screen.root_depth,
+            event_mask=X.KeyPressMask | X.ButtonPressMask, override_redirect=True,
+        )
+        self.win.map()
+        self.d.sync()
+        self.win.set_input_focus(X.RevertToParent, X.CurrentTime)
+        self.d.sync()
+
+    def close(self):
+        self.d.close()
+
+    def pointer(self):
+        p = self.root.query_pointer()
+        return p.root_x, p.root_y
+
+    def warp(self, x, y):
+        self.root.warp_pointer(x, y)
+        self.d.sync()
+
+    def drain(self):
+        while self.d.pending_events():
+            self.d.next_event()
+
+    def wait_pointer(self, start, target=None, timeout=TIMEOUT):
+        """(position, time) once the pointer leaves `start` (or reaches `target`); None on timeout."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            pos = self.pointer()
+            if (pos == target) if target is not None else (pos != start):
+                return pos, time.perf_counter()
+        return None
+
+    def wait_event(self, timeout=TIMEOUT):
+        """(what, time) for the next key press (keysym) or button press (number)."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            while self.d.pending_events():
+                ev = self.d.next_event()
+                now = time.perf_counter()
+                if ev.type == self.X.ButtonPress:
+                    return ev.detail, now
+                if ev.type == self.X.KeyPress:
+                    return self.d.keycode_to_keysym(ev.detail, 0), now
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                return None
+            select.select([self.d.fileno()], [], [], min(left, 0.005))
+
+
+def start_server(backend, display, sock_path, log_path, **extra_env):
+    """laptop_server.py --user with BACKEND=backend; returns the process once it reports ready."""
+    fifo = sock_path + ".ready"
+    os.mkfifo(fifo)
+    env = {
+        **os.environ, "DISPLAY": display, "BACKEND": backend, "KEYBOARDMOUSE_SOCK": sock_path,
+        "KEYBOARDMOUSE_READY_FIFO": fifo, "LOG_LEVEL": "WARNING",
+        "KEY_REPEAT": "0", "SMOOTHING": "", "GEOMETRY_POLL_S": "0", "METRICS_PORT": "", **extra_env,
+    }
+    env.pop("XDG_SESSION_TYPE", None)
+    env.pop("WAYLAND_DISPLAY", None)
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "laptop_server.py"), "--user"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    fd = os.open(fifo, os.O_RDWR)  # like the shell's <>: never blocks on open
+    try:
+        ready, _, _ = select.select([fd], [], [], 20)
+        ok = bool(ready) and os.read(fd, 16).startswith(b"READY")
+    finally:
+        os.close(fd)
+        os.unlink(fifo)
+    if not ok:
+        proc.kill()
+        return None
+    return proc
+
+
+def _pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+def bench_backend(backend, display, obs, samples, stream):
+    """Run the script against one backend; returns a result dict."""
+    tmp = tempfile.mkdtemp()
+    sock_path = os.path.join(tmp, "bench.sock")
+    log_path = os.path.join(tmp, "server.log")
+    proc = start_server(backend, display, sock_path, log_path)
+    result = {"backend": backend, "errors": [], "move": [], "key": [], "click": []}
+    if proc is None:
+        result["skipped"] = "server did not become ready"
+        return result
+    with open(log_path) as f:
+        chosen = f.read()
+    if f">>> Input backend: {backend}" not in chosen:
+        proc.kill()
+        result["skipped"] = "backend not available"
+        return result
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(sock_path)
+
+    def send(line):
+        conn.sendall((line + "\n").encode("utf-8"))
+        return time.perf_counter()
+
+    try:
+        # Relative motion: displacement must match exactly (catches inverted or scaled axes)
+        for i in range(samples):
+            dx, dy = MOVES[i % len(MOVES)]
+            obs.warp(WIDTH // 2, HEIGHT // 2)
+            start = obs.pointer()
+            sent = send(f"MOVE:{dx},{dy}")
+            seen = obs.wait_pointer(start, (start[0] + dx, start[1] + dy))
+            if seen is None:
+                got = obs.pointer()
+                result["errors"].append(f"MOVE:{dx},{dy} moved by {got[0] - start[0]},{got[1] - start[1]}")
+                continue
+            result["move"].append(seen[1] - sent)
+
+        # Buttons and wheel: the X button number must match
+        obs.warp(WIDTH // 2, HEIGHT // 2)
+        obs.drain()
+        for i in range(samples):
+            line, want = CLICKS[i % len(CLICKS)]
+            sent = send(line)
+            seen = obs.wait_event()
+            if seen is None or seen[0] != want:
+                result["errors"].append(f"{line}: expected button {want}, got {seen and seen[0]}")
+                obs.drain()
+                continue
+            result["click"].append(seen[1] - sent)
+
+        # Keys: the keysym must match
+        obs.drain()
+        for i in range(samples):
+            line, want = KEYS[i % len(KEYS)]
+            sent = send(line)
+            seen = obs.wait_event()
+            # keysym_to_string() gives "\r" for Return, so compare keysyms, not strings
+            if seen is None or seen[0] != obs.XK.string_to_keysym(want):
+                got = seen and f"keysym {seen[0]:#x}"
+                result["errors"].append(f"{line}: expected key {want}, got {got}")
+                obs.drain()
+                continue
+            result["key"].append(seen[1] - sent)
+
+        # Throughput: a stream of 1-pixel moves, until the pointer has travelled all of it
+        obs.warp(100, HEIGHT // 2)
+        start = time.perf_counter()
+        conn.sendall(("MOVE:1,0\n" * stream).encode("ascii"))
+        seen = obs.wait_pointer(None, (100 + stream, HEIGHT // 2), timeout=30)
+        if seen is None:
+            result["errors"].append(f"{stream} x MOVE:1,0 ended at {obs.pointer()}")
+        else:
+            result["move_lines_per_s"] = stream / (seen[1] - start)
+
+        # Throughput: keys, counted as they arrive
+        obs.drain()
+        count = min(stream, 200)
+        start = time.perf_counter()
+        conn.sendall(b"KEY:a\n" * count)
+        arrived = 0
+        while arrived < count and obs.wait_event() is not None:
+            arrived += 1
+        if arrived < count:
+            result["errors"].append(f"{count} x KEY:a: only {arrived} arrived")
+        else:
+            result["keys_per_s"] = count / (time.perf_counter() - start)
+    finally:
+        conn.close()
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return result
+
+
+def bench_mpx(display, obs, samples):
+    """MPX=1 with two clients: each MOVE must move only that client's own master pointer,
+    never the core pointer, and both masters must be gone after disconnect."""
+    import mpx
+
+    tmp = tempfile.mkdtemp()
+    sock_path = os.path.join(tmp, "bench.sock")
+    result = {"backend": "mpx", "errors": [], "move": [], "key": [], "click": []}
+    if not mpx.available():
+        result["skipped"] = "xinput or libXi/libXtst missing"
+        return result
+    proc = start_server("null", display, sock_path, os.path.join(tmp, "server.log"), MPX="1")
+    if proc is None:
+        result["skipped"] = "server did not become ready"
+        return result
+    conns, probes = [], {}
+    try:
+        for _ in range(2):
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.connect(sock_path)
+            conns.append(conn)
+        deadline = time.perf_counter() + TIMEOUT
+        while len(mpx.masters()) < 2 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        # Our own connection per master, to read where that master's cursor is
+        probes = {name: mpx.XTestClient(dev) for name, dev in mpx.masters().items()}
+        if len(probes) != 2:
+            result["errors"].append(f"expected 2 masters, found {sorted(probes)}")
+            return result
+
+        owner = {}  # connection index -> master name, learnt from the first move
+        for i in range(samples):
+            c = i % 2
+            dx, dy = MOVES[i % len(MOVES)]
+            for p in probes.values():
+                p.move_to(WIDTH // 2, HEIGHT // 2)  # the probe shares the master, so this recentres it
+                p.flush()
+            before = {name: p.pointer() for name, p in probes.items()}
+            core = obs.pointer()
+            sent = time.perf_counter()
+            conns[c].sendall(f"MOVE:{dx},{dy}\n".encode("ascii"))
+            moved = None
+            while moved is None and time.perf_counter() - sent < TIMEOUT:
+                moved = next((n for n, p in probes.items() if p.pointer() != before[n]), None)
+            seen = time.perf_counter()
+            if moved is None:
+                result["errors"].append(f"client {c} MOVE:{dx},{dy} moved no master")
+                continue
+            after = probes[moved].pointer()
+            if owner.setdefault(c, moved) != moved:
+                result["errors"].append(f"client {c} moved {moved}, not its own {owner[c]}")
+            elif (after[0] - before[moved][0], after[1] - before[moved][1]) != (dx, dy):
+                result["errors"].append(f"client {c} MOVE:{dx},{dy} moved {moved} to {after} from {before[moved]}")
+            elif obs.pointer() != core:
+                result["errors"].append(f"client {c} MOVE:{dx},{dy} also moved the core pointer")
+            else:
+                result["move"].append(seen - sent)
+        if len(set(owner.values())) != 2:
+            result["errors"].append(f"clients did not get separate masters: {owner}")
+    finally:
+        for p in probes.values():
+            p.close()
+        for conn in conns:
+            conn.close()
+        deadline = time.perf_counter() + TIMEOUT
+        while mpx.masters() and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        if mpx.masters():
+            result["errors"].append(f"masters left after disconnect: {sorted(mpx.masters())}")
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return result
+
+
+def report(results):
+    print(f"{'backend':<10} {'move p50/p95 ms':>16} {'click p50/p95':>14} {'key p50/p95':>13} "
+          f"{'moves/s':>9} {'keys/s':>8}  errors")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['backend']:<10} skipped: {r['skipped']}")
+            continue
+        cols = [f"{_pct(r[k], 0.5):.2f}/{_pct(r[k], 0.95):.2f}" for k in ("move", "click", "key")]
+        print(f"{r['backend']:<10} {cols[0]:>16} {cols[1]:>14} {cols[2]:>13} "
+              f"{r.get('move_lines_per_s', 0):>9,.0f} {r.get('keys_per_s', 0):>8,.0f}  {len(r['errors'])}")
+    for r in results:
+        for e in r.get("errors", [])[:10]:
+            print(f"  {r['backend']}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(X11_BACKENDS), help="comma-separated backend names")
+    parser.add_argument("--samples", type=int, default=30, help="latency samples per kind")
+    parser.add_argument("--stream", type=int, default=600, help="lines in the throughput runs")
+    parser.add_argument("--no-mpx", action="store_true", help="skip the two-client MPX check")
+    opts = parser.parse_args()
+    if not shutil.which("Xvfb"):
+        raise SystemExit("Xvfb not found. Install: sudo apt install xvfb")
+    try:
+        import Xlib  # noqa: F401
+    except ImportError:
+        raise SystemExit("python-xlib not found. Install: pip install python-xlib")
+
+    xvfb, display = start_xvfb()
+    try:
+        obs = Observer(display)
+        results = [
+            bench_backend(name.strip(), display, obs, opts.samples, min(opts.stream, WIDTH - 200))
+            for name in opts.backends.split(",") if name.strip()
+        ]
+        if not opts.no_mpx:
+            results.append(bench_mpx(display, obs, opts.samples))
+        obs.close()
+    finally:
+        xvfb.terminate()
+    report(results)
+    sys.exit(1 if any(r.get("errors") for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Startup calibration: pick the input backend by measured speed instead of a fixed order.
+
+Each candidate that probes OK is opened, warmed up and timed on a few events that change
+nothing on screen: a zero-distance MOVE (pointer class) and a KEY_UP of a modifier that
+is not held (key class). A backend that raises, returns False or counts a backend error
+is not correct and drops out; the fastest correct one for pointer events wins.
+
+The result is saved to ~/.keyboardmouse_backend.json and reused while the session type,
+display and candidate list are the same, so later starts cost nothing.
+
+  BACKEND=<name>        skip all of this (as before)
+  CALIBRATE=0           fixed order instead (pyautogui, xdotool, ydotool, pynput)
+  CALIBRATE=1           measure again now, ignoring the saved result
+  CALIBRATE_SPLIT=1     allow a different backend for keys than for the pointer
+  CALIBRATE_ROUNDS=5    timed calls per event class and backend
+  BACKEND_CACHE=<path>  where the result is kept
+"""
+
+import json
+import logging
+import os
+import time
+
+from protocol import CMD_KEY_UP, CMD_MOUSE_MOVE
+
+log = logging.getLogger(__name__)
+
+POINTER, KEYS = "pointer", "keys"
+
+# Per class: one event with no visible effect
+NOOP_EVENTS = {
+    POINTER: [(CMD_MOUSE_MOVE, ["0,0"])],
+    KEYS: [(CMD_KEY_UP, ["shift"])],  # releasing an unpressed modifier: apps see nothing to do
+}
+
+
+def _split_allowed() -> bool:
+    return os.environ.get("CALIBRATE_SPLIT", "").strip() not in ("", "0")
+
+
+def cache_path() -> str:
+    return os.path.expanduser(os.environ.get("BACKEND_CACHE", "~/.keyboardmouse_backend.json"))
+
+
+def fingerprint(candidates) -> dict:
+    """What the result depends on; a saved result is reused only if this matches."""
+    return {
+        "session": os.environ.get("XDG_SESSION_TYPE", ""),
+        "display": os.environ.get("DISPLAY", ""),
+        "wayland_display": os.environ.get("WAYLAND_DISPLAY", ""),
+        "candidates": list(candidates),
+        "split": _split_allowed(),
+    }
+
+
+def load(candidates):
+    """The saved choice {class: backend name} for this fingerprint, or None."""
+    try:
+        with open(cache_path()) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(saved, dict) or saved.get("fingerprint") != fingerprint(candidates):
+        return None
+    choice = saved.get("choice")
+    if not isinstance(choice, dict) or not all(choice.get(c) in candidates for c in (POINTER, KEYS)):
+        return None
+    return choice
+
+
+def save(candidates, results, choice):
+    path = cache_path()
+    data = {
+        "fingerprint": fingerprint(candidates),
+        "measured": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+        "choice": choice,
+    }
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        log.warning("Cannot save backend calibration to %s: %s", path, e)
+
+
+def measure(backend, errors, rounds) -> dict:
+    """Time NOOP_EVENTS on an opened backend: {class: median ms} or {"error": reason}.
+    errors() returns the backend's error count, to catch failures it only logs."""
+    result = {}
+    try:
+        backend.warm_up()
+        for cls, events in NOOP_EVENTS.items():
+            before = errors()
+            times = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                ok = backend.inject_batch(events)
+                times.append(time.perf_counter() - start)
+                if ok is False or errors() != before:
+                    return {"error": f"{cls} events failed"}
+            result[cls] = round(sorted(times)[len(times) // 2] * 1000, 3)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return result
+
+
+def calibrate(candidates: dict, errors, rounds=None, split=None):
+    """Measure every candidate (name -> backend class) that probes OK.
+
+    Returns (choice {class: name}, opened {name: backend} for the chosen names, results).
+    errors(name) is the backend's error count. Losers are closed; choice is None if no
+    candidate works."""
+    rounds = rounds or int(os.environ.get("CALIBRATE_ROUNDS", 5))
+    if split is None:
+        split = _split_allowed()
+    results, opened = {}, {}
+    for name, cls in candidates.items():
+        try:
+            if not cls.probe():
+                results[name] = {"error": "probe failed"}
+                continue
+            backend = cls()
+            backend.open()
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        results[name] = measure(backend, lambda: errors(name), rounds)
+        if "error" in results[name]:
+            backend.close()
+        else:
+            opened[name] = backend
+        log.info("Calibration %s: %s", name, results[name])
+
+    if not opened:
+        return None, {}, results
+    pointer = min(opened, key=lambda n: results[n][POINTER])
+    keys = min(opened, key=lambda n: results[n][KEYS]) if split else pointer
+    choice = {POINTER: pointer, KEYS: keys}
+    for name, backend in list(opened.items()):
+        if name not in choice.values():
+            backend.close()
+            del opened[name]
+    return choice, opened, results
@@ -0,0 +1,122 @@
+"""
+Clipboard push from the phone: CLIP_BEGIN / CLIP_DATA / CLIP_END (see protocol.py).
+
+The phone sends the text in CLIP_CHUNK-sized base64 chunks, paced so keys and clicks can
+be sent between them. The user server collects the chunks per connection, checks the
+length and CRC-32 from CLIP_BEGIN, then sets the desktop clipboard with one call to
+wl-copy (Wayland), xclip or xsel, and optionally presses the paste chord.
+
+  CLIP_MAX_BYTES=1048576   largest accepted transfer
+  CLIP_PASTE=ctrl+v        chord for CLIP_BEGIN:...:paste (ctrl+shift+v for terminals)
+"""
+
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import zlib
+
+from protocol import CMD_CLIP_BEGIN, CMD_CLIP_DATA, CMD_CLIP_END, CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP
+
+log = logging.getLogger(__name__)
+
+CLIP_COMMANDS = {CMD_CLIP_BEGIN, CMD_CLIP_DATA, CMD_CLIP_END}
+
+
+class ClipError(ValueError):
+    """A transfer that cannot be completed; reported back as CLIP_ERROR:<reason>."""
+
+
+class ClipReceiver:
+    """Reassembles one connection's transfer. handle() returns (bytes, paste) when complete."""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = int(max_bytes or os.environ.get("CLIP_MAX_BYTES", 1 << 20))
+        self._reset()
+
+    def _reset(self):
+        self.data = None
+        self.length = 0
+        self.crc = 0
+        self.paste = False
+
+    def handle(self, cmd: str, args: list[str]):
+        arg = args[0].strip() if args else ""
+        if cmd == CMD_CLIP_BEGIN:
+            self._reset()
+            parts = arg.split(":")
+            try:
+                self.length, self.crc = int(parts[0]), int(parts[1], 16)
+            except (IndexError, ValueError):
+                raise ClipError("bad CLIP_BEGIN")
+            if not 0 <= self.length <= self.max_bytes:
+                raise ClipError(f"too large (limit {self.max_bytes} bytes)")
+            self.paste = "paste" in parts[2:]
+            self.data = bytearray()
+            return None
+        if self.data is None:
+            raise ClipError(f"{cmd} without CLIP_BEGIN")
+        if cmd == CMD_CLIP_DATA:
+            offset, _, chunk = arg.partition(":")
+            try:
+                offset, chunk = int(offset), base64.b64decode(chunk, validate=True)
+            except ValueError:  # includes binascii.Error
+                self._reset()
+                raise ClipError("bad chunk")
+            if offset != len(self.data):
+                self._reset()
+                raise ClipError("chunk out of order")
+            self.data += chunk
+            if len(self.data) > self.length:
+                self._reset()
+                raise ClipError("more data than announced")
+            return None
+        # CLIP_END
+        data, paste = bytes(self.data), self.paste
+        length, crc = self.length, self.crc
+        self._reset()
+        if len(data) != length:
+            raise ClipError(f"got {len(data)} of {length} bytes")
+        if zlib.crc32(data) != crc:
+            raise ClipError("checksum mismatch")
+        return data, paste
+
+
+def _clipboard_commands():
+    """Clipboard writers to try, best first for this session."""
+    candidates = [
+        ["xclip", "-selection", "clipboard"],
+        ["xsel", "--clipboard", "--input"],
+    ]
+    if os.environ.get("WAYLAND_DISPLAY"):
+        candidates.insert(0, ["wl-copy"])
+    return [c for c in candidates if shutil.which(c[0])]
+
+
+def set_clipboard(data: bytes) -> bool:
+    """Put UTF-8 text on the desktop clipboard. False if no tool could do it."""
+    env = {**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")}
+    for argv in _clipboard_commands():
+        try:
+            # The tools fork a process that keeps serving the selection; it must not hold our pipes
+            r = subprocess.run(
+                argv, input=data, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=2,
+            )
+            if r.returncode == 0:
+                return True
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+    log.error("Cannot set the clipboard: install xclip, xsel or wl-clipboard")
+    return False
+
+
+def paste_chord() -> list:
+    """Events for the paste chord in $CLIP_PASTE (default ctrl+v)."""
+    keys = [k.strip().lower() for k in os.environ.get("CLIP_PASTE", "ctrl+v").split("+") if k.strip()]
+    *mods, key = keys or ["ctrl", "v"]
+    return (
+        [(CMD_KEY_DOWN, [m]) for m in mods]
+        + [(CMD_KEY, [key])]
+        + [(CMD_KEY_UP, [m]) for m in reversed(mods)]
+    )
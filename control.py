@@ -0,0 +1,153 @@
+"""
+Admin control socket of the user server: retune it while phones stay connected.
+
+The user server listens on ~/.keyboardmouse[-<session>].ctl (KEYBOARDMOUSE_CONTROL=<path>
+to move it, CONTROL=0 to disable), owner-only. One command per line; the reply is zero or
+more lines followed by an empty line. From a shell:
+
+  python laptop_server.py --ctl clients
+  python laptop_server.py --ctl set SMOOTH_RATE 120
+  python laptop_server.py --ctl backend xdotool
+
+See `help` for the commands. Nothing here touches the relay, so the Bluetooth link stays up.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ControlError(ValueError):
+    """Bad command or argument; its message is the reply."""
+
+
+def control_path(socket_path: str) -> str:
+    """Control socket next to the user server's socket, unless KEYBOARDMOUSE_CONTROL is set."""
+    override = os.environ.get("KEYBOARDMOUSE_CONTROL", "").strip()
+    if override:
+        return override
+    base = socket_path[: -len(".sock")] if socket_path.endswith(".sock") else socket_path
+    return base + ".ctl"
+
+
+class Tracer:
+    """Optional capture of what the pipeline does, one tab-separated line per record:
+    monotonic time, client id, kind (recv, inject), detail. Off unless started."""
+
+    def __init__(self):
+        self.active = False
+        self.path = None
+        self.records = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, path: str):
+        f = open(path, "a", buffering=1 << 16)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file, self.path, self.records = f, path, 0
+            self.active = True
+
+    def stop(self) -> int:
+        """Close the file; returns how many records it got."""
+        with self._lock:
+            self.active = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            return self.records
+
+    def record(self, client, kind: str, detail: str):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(f"{time.monotonic():.6f}\t{client}\t{kind}\t{detail}\n")
+            self.records += 1
+
+
+# Shared by the user server's connection threads (checked with TRACE.active on the hot path)
+TRACE = Tracer()
+
+
+class ControlServer:
+    """Accepts control connections in a daemon thread. commands: name -> callable(args) -> str."""
+
+    def __init__(self, path: str, commands: dict):
+        self.path = path
+        self.commands = commands
+        self.sock = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)  # owner-only from the start, not after a chmod
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(4)
+        self.sock = sock
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        log.info("Control socket on %s", self.path)
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # closed
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def execute(self, line: str) -> str:
+        words = line.split()
+        if not words:
+            return ""
+        handler = self.commands.get(words[0].lower())
+        if handler is None:
+            return f"error: unknown command {words[0]!r} (try help)"
+        try:
+            return handler(words[1:])
+        except ControlError as e:
+            return f"error: {e}"
+        except Exception as e:
+            log.exception("Control command failed: %s", line)
+            return f"error: {e}"
+
+    def _serve(self, conn):
+        with conn, conn.makefile("rw", encoding="utf-8", newline="\n") as f:
+            for line in f:
+                log.info("Control: %s", line.strip())
+                reply = self.execute(line).rstrip("\n")
+                f.write(reply + "\n\n" if reply else "\n")
+                f.flush()
+
+
+def request(path: str, line: str, timeout: float = 10.0) -> str:
+    """Send one command to a control socket and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        s.sendall(line.strip().encode("utf-8") + b"\n")
+        data = b""
+        while not (data.endswith(b"\n\n") or data == b"\n"):
+            chunk = s.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    return data.decode("utf-8").rstrip("\n")
@@ -0,0 +1,56 @@
+"""
+Touch-pad gestures recognised on the phone and sent as one line each:
+
+  GESTURE:scroll:<dy>       two-finger scroll, in wheel notches (+ = up)
+  GESTURE:right_click       two-finger tap
+  GESTURE:pinch_in[:<n>]    fingers together, n steps (zoom out)
+  GESTURE:pinch_out[:<n>]   fingers apart, n steps (zoom in)
+  GESTURE:swipe_left|swipe_right|swipe_up|swipe_down   three-finger swipe
+
+The user server maps each name to a short command sequence, compiled once for its input
+backend like a macro. Override or add one with a macro named gesture_<name> in the
+macros file (see macros.py), e.g.  "gesture_swipe_up": ["KEY_DOWN:ctrl", "KEY:up", "KEY_UP:ctrl"]
+"""
+
+from protocol import CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP, CMD_MOUSE_CLICK, CMD_SCROLL
+
+GESTURE_SCROLL = "scroll"
+MAX_REPEAT = 10  # cap on pinch steps per line
+
+# name -> [(cmd, args), ...]
+DEFAULT_GESTURES = {
+    "right_click": [(CMD_MOUSE_CLICK, ["right"])],
+    # Ctrl+wheel zooms in browsers, editors and image viewers
+    "pinch_in": [(CMD_KEY_DOWN, ["ctrl"]), (CMD_SCROLL, ["-1"]), (CMD_KEY_UP, ["ctrl"])],
+    "pinch_out": [(CMD_KEY_DOWN, ["ctrl"]), (CMD_SCROLL, ["1"]), (CMD_KEY_UP, ["ctrl"])],
+    # Back / forward, activities overview, show desktop
+    "swipe_left": [(CMD_KEY_DOWN, ["alt"]), (CMD_KEY, ["left"]), (CMD_KEY_UP, ["alt"])],
+    "swipe_right": [(CMD_KEY_DOWN, ["alt"]), (CMD_KEY, ["right"]), (CMD_KEY_UP, ["alt"])],
+    "swipe_up": [(CMD_KEY, ["win"])],
+    "swipe_down": [(CMD_KEY_DOWN, ["win"]), (CMD_KEY, ["d"]), (CMD_KEY_UP, ["win"])],
+}
+
+
+def load_gestures(macros: dict) -> dict:
+    """Gesture name -> steps: the defaults, overridden by gesture_<name> macros."""
+    gestures = dict(DEFAULT_GESTURES)
+    for name, steps in macros.items():
+        if name.startswith("gesture_"):
+            gestures[name[len("gesture_"):]] = steps
+    return gestures
+
+
+def parse_gesture(args) -> tuple[str, str] | None:
+    """GESTURE arguments -> (name, arg); arg is "" when absent."""
+    if not args or not args[0].strip():
+        return None
+    name, _, arg = args[0].strip().partition(":")
+    return name.lower(), arg.strip()
+
+
+def repeat_count(arg: str) -> int:
+    """Steps for a repeatable gesture (pinch), 1..MAX_REPEAT."""
+    try:
+        return min(max(int(arg), 1), MAX_REPEAT)
+    except ValueError:
+        return 1
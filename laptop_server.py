@@ -6,20 +6,51 @@ Bluetooth keyboard/mouse server. Run in two parts so pynput runs as your user
   Terminal 1:  ./venv/bin/python laptop_server.py --user
   Terminal 2:   sudo ./venv/bin/python laptop_server.py --bt
 
+Optional LAN transport instead of (or next to) Bluetooth, no sudo needed:
+
+  Terminal 3:  ./venv/bin/python laptop_server.py --net
+
 Or use  ./run_server.sh  to start both.
 """
 
+import ctypes
+import ctypes.util
+import fcntl
+import hmac
+import itertools
+import math
 import os
-import pwd
+import re
+import secrets
 import socket
+import struct
 import subprocess
 import sys
+import termios
+import threading
+import time
 import logging
 
-from protocol import SPP_UUID, parse_command, CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP
-from protocol import CMD_MOUSE_MOVE, CMD_MOUSE_CLICK, CMD_SCROLL
+import calibration
+import metrics
+import mpx
+from motion import MotionSmoother
 
-logging.basicConfig(level=logging.INFO)
+from protocol import parse_command, CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP
+from protocol import CMD_MOUSE_MOVE, CMD_MOUSE_CLICK, CMD_SCROLL, CMD_MACRO
+from protocol import CMD_MOUSE_MOVE_ABS, CMD_GESTURE, encode_geometry, encode_command
+from protocol import CMD_CLIP_BEGIN, CMD_CLIP_DATA, CMD_CLIP_END, MSG_CLIP_OK, MSG_CLIP_ERROR
+from protocol import CMD_PING, MSG_PONG, CMD_LANE, LANE_POINTER
+from protocol import NET_PORT, NET_MOTION_SYNC, CMD_AUTH, parse_motion
+from macros import load_macros, MACRO_DELAY
+from gestures import load_gestures, parse_gesture, repeat_count, GESTURE_SCROLL
+from clipboard import ClipReceiver, ClipError, CLIP_COMMANDS, set_clipboard, paste_chord
+from transports import transport_from_argv, TransportClosed
+from sessions import SessionRegistry, read_first_line, read_hello, socket_path
+from activation import listen_fds, notify_ready
+from control import ControlServer, ControlError, TRACE, control_path, request
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 log = logging.getLogger(__name__)
 
 # xdotool key names (X11) for reliable injection into the display
@@ -29,6 +60,8 @@ XDOTOOL_KEYS = {
     "up": "Up", "down": "Down", "left": "Left", "right": "Right",
     "home": "Home", "end": "End", "pageup": "Page_Up", "pagedown": "Page_Down",
     "insert": "Insert", "delete": "Delete",
+    "shift": "shift", "ctrl": "ctrl", "control": "ctrl", "alt": "alt",
+    "cmd": "super", "command": "super", "win": "super",
 }
 
 # ydotool: Linux evdev keycodes (for Wayland). Format keycode:1 keycode:0 for press+release.
@@ -39,8 +72,46 @@ YDOTOOL_KEYCODES = {
     "up": 103, "down": 108, "left": 105, "right": 106,
     "home": 102, "end": 107, "pageup": 104, "pagedown": 109,
     "insert": 110, "delete": 111,
+    "shift": 42, "ctrl": 29, "control": 29, "alt": 56,
+    "cmd": 125, "command": 125, "win": 125,
 }
 
+# Live metrics (served by metrics.py when METRICS_PORT is set)
+KNOWN_COMMANDS = {
+    CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP, CMD_MOUSE_MOVE, CMD_MOUSE_MOVE_ABS, CMD_MOUSE_CLICK, CMD_SCROLL, CMD_MACRO,
+    CMD_GESTURE, CMD_CLIP_BEGIN, CMD_CLIP_DATA, CMD_CLIP_END, CMD_PING,
+}
+M_RECEIVED = metrics.counter("kbm_events_received_total", "Commands received from relays.", ("command",))
+M_INJECTED = metrics.counter("kbm_events_injected_total", "Events handed to the input backend.", ("command",))
+M_BACKEND_SECONDS = metrics.histogram("kbm_backend_call_seconds", "Duration of one backend batch call.", ("backend",))
+M_BACKEND_ERRORS = metrics.counter("kbm_backend_errors_total", "Failed backend calls, including ones no longer logged.", ("backend",))
+M_BATCH_EVENTS = metrics.histogram(
+    "kbm_batch_events", "Events per backend batch call.", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+M_QUEUE_BYTES = metrics.gauge("kbm_queue_depth_bytes", "Bytes waiting in the relay socket when a burst was read.")
+M_CONNECTIONS = metrics.gauge(
+    "kbm_relay_connections", "Relay connections to this user server (one per phone, two with a pointer lane).",
+)
+M_COALESCING = metrics.gauge(
+    "kbm_move_coalescing_ratio", "MOVE lines received per MOVE injected.",
+    fn=lambda: M_RECEIVED.value(CMD_MOUSE_MOVE) / max(M_INJECTED.value(CMD_MOUSE_MOVE), 1),
+)
+
+
+def _cmd_label(cmd: str) -> str:
+    """Metric label for a command; unknown names share one label so clients can't add series."""
+    if cmd == MOVE_TO:
+        return CMD_MOUSE_MOVE_ABS
+    return cmd if cmd in KNOWN_COMMANDS else "other"
+
+
+def _socket_backlog(conn) -> int:
+    """Bytes the kernel has received on conn that we have not read yet (FIONREAD)."""
+    try:
+        return struct.unpack("i", fcntl.ioctl(conn.fileno(), termios.FIONREAD, b"\0\0\0\0"))[0]
+    except OSError:
+        return 0
+
 
 def _ydotool_available():
     """True if ydotool is installed and ydotoold is running (for Wayland)."""
@@ -67,64 +138,14 @@ def _ydotool_run(*args):
             capture_output=True,
             timeout=2,
         )
+        if r.returncode != 0:
+            M_BACKEND_ERRORS.inc("ydotool")
         return r.returncode == 0
     except Exception:
+        M_BACKEND_ERRORS.inc("ydotool")
         return False
 
 
-def _handle_command_ydotool(cmd: str, args: list[str]) -> bool:
-    """Inject key/mouse via ydotool (Wayland and X11)."""
-    try:
-        if cmd == CMD_KEY:
-            if not args:
-                return True
-            name = args[0].strip().lower()
-            code = YDOTOOL_KEYCODES.get(name)
-            if code is None:
-                if len(name) == 1:
-                    # Use 'type' for single chars
-                    _ydotool_run("type", name)
-                return True
-            _ydotool_run("key", f"{code}:1", f"{code}:0")
-        elif cmd == CMD_KEY_DOWN:
-            if not args:
-                return True
-            code = YDOTOOL_KEYCODES.get(args[0].strip().lower())
-            if code is not None:
-                _ydotool_run("key", f"{code}:1")
-        elif cmd == CMD_KEY_UP:
-            if not args:
-                return True
-            code = YDOTOOL_KEYCODES.get(args[0].strip().lower())
-            if code is not None:
-                _ydotool_run("key", f"{code}:0")
-        elif cmd == CMD_MOUSE_MOVE:
-            if not args or "," not in args[0]:
-                return True
-            dx, dy = args[0].strip().split(",", 1)
-            dx, dy = int(dx.strip()), int(dy.strip())
-            _ydotool_run("mousemove", str(dx), str(dy))
-        elif cmd == CMD_MOUSE_CLICK:
-            btn = (args or ["left"])[0].strip().lower()
-            # ydotool click: 0x00=left, 0x01=right, 0x02=middle
-            code = "0x00" if btn == "left" else ("0x01" if btn == "right" else "0x02")
-            _ydotool_run("click", code)
-        elif cmd == CMD_SCROLL:
-            if not args:
-                return True
-            dy = int(args[0].strip())
-            # Scroll: 0x04=scroll up, 0x05=scroll down (ydotool click)
-            code = "0x04" if dy > 0 else "0x05"
-            count = min(max(abs(dy), 1), 20)
-            for _ in range(count):
-                _ydotool_run("click", code)
-        else:
-            log.warning("Unknown command: %s", cmd)
-    except Exception as e:
-        log.exception("ydotool command failed: %s %s", cmd, args)
-    return True
-
-
 def _xdotool_available():
     """True if xdotool is installed and we can use it to control the display."""
     if os.name != "posix":
@@ -155,6 +176,8 @@ def _xdotool_run(env, *args):
             capture_output=True,
             timeout=2,
         )
+        if r.returncode != 0:
+            M_BACKEND_ERRORS.inc("xdotool")
         if r.returncode != 0 and not _xdotool_error_logged:
             _xdotool_error_logged = True
             err = (r.stderr or b"").decode("utf-8", errors="replace").strip()
@@ -162,61 +185,13 @@ def _xdotool_run(env, *args):
             log.error("DISPLAY=%s - if empty or wrong, input will not control the screen.", env.get("DISPLAY", ""))
         return r.returncode == 0
     except Exception as e:
+        M_BACKEND_ERRORS.inc("xdotool")
         if not _xdotool_error_logged:
             _xdotool_error_logged = True
             log.exception("xdotool run failed: %s", e)
         return False
 
 
-def _handle_command_xdotool(cmd: str, args: list[str]) -> bool:
-    """Inject key/mouse via xdotool so they actually control the screen (X11)."""
-    env = {**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")}
-    try:
-        if cmd == CMD_KEY:
-            if not args:
-                return True
-            name = args[0].strip().lower()
-            key = XDOTOOL_KEYS.get(name, name if len(name) == 1 else None)
-            if key is None:
-                return True
-            _xdotool_run(env, "key", key)
-        elif cmd == CMD_KEY_DOWN:
-            if not args:
-                return True
-            name = args[0].strip().lower()
-            key = XDOTOOL_KEYS.get(name, name if len(name) == 1 else None)
-            if key:
-                _xdotool_run(env, "keydown", key)
-        elif cmd == CMD_KEY_UP:
-            if not args:
-                return True
-            name = args[0].strip().lower()
-            key = XDOTOOL_KEYS.get(name, name if len(name) == 1 else None)
-            if key:
-                _xdotool_run(env, "keyup", key)
-        elif cmd == CMD_MOUSE_MOVE:
-            if not args or "," not in args[0]:
-                return True
-            dx, dy = args[0].strip().split(",", 1)
-            dx, dy = int(dx.strip()), int(dy.strip())
-            _xdotool_run(env, "mousemove_relative", "--", str(dx), str(dy))
-        elif cmd == CMD_MOUSE_CLICK:
-            btn = (args or ["left"])[0].strip().lower()
-            button = "1" if btn != "right" and btn != "middle" else ("3" if btn == "right" else "2")
-            _xdotool_run(env, "click", button)
-        elif cmd == CMD_SCROLL:
-            if not args:
-                return True
-            dy = int(args[0].strip())
-            count = min(max(abs(dy), 1), 20)
-            for _ in range(count):
-                _xdotool_run(env, "click", "4" if dy > 0 else "5")
-        else:
-            log.warning("Unknown command: %s", cmd)
-    except Exception as e:
-        log.exception("xdotool command failed: %s %s", cmd, args)
-    return True
-
 def _pyautogui_available():
     """True if pyautogui can be imported and used (works on some X11/Wayland setups)."""
     try:
@@ -234,66 +209,14 @@ PYAUTOGUI_KEYS = {
     "up": "up", "down": "down", "left": "left", "right": "right",
     "home": "home", "end": "end", "pageup": "pageup", "pagedown": "pagedown",
     "insert": "insert", "delete": "delete",
+    "shift": "shift", "ctrl": "ctrl", "control": "ctrl", "alt": "alt",
+    "cmd": "win", "command": "win", "win": "win",
 }
 
 
-def _handle_command_pyautogui(cmd: str, args: list[str]) -> bool:
-    """Inject key/mouse via pyautogui (often works where xdotool/ydotool fail)."""
-    try:
-        import pyautogui
-        pyautogui.FAILSAFE = False  # allow remote control without corner trigger
-        if cmd == CMD_KEY:
-            if not args:
-                return True
-            name = args[0].strip().lower()
-            key = PYAUTOGUI_KEYS.get(name)
-            if key:
-                pyautogui.press(key)
-            elif len(name) == 1:
-                pyautogui.write(name)
-        elif cmd == CMD_KEY_DOWN:
-            if not args:
-                return True
-            key = PYAUTOGUI_KEYS.get(args[0].strip().lower())
-            if key:
-                pyautogui.keyDown(key)
-        elif cmd == CMD_KEY_UP:
-            if not args:
-                return True
-            key = PYAUTOGUI_KEYS.get(args[0].strip().lower())
-            if key:
-                pyautogui.keyUp(key)
-        elif cmd == CMD_MOUSE_MOVE:
-            if not args or "," not in args[0]:
-                return True
-            dx, dy = args[0].strip().split(",", 1)
-            dx, dy = int(dx.strip()), int(dy.strip())
-            pyautogui.moveRel(dx, -dy, duration=0)
-        elif cmd == CMD_MOUSE_CLICK:
-            btn = (args or ["left"])[0].strip().lower()
-            if btn == "right":
-                pyautogui.click(button="right")
-            elif btn == "middle":
-                pyautogui.click(button="middle")
-            else:
-                pyautogui.click(button="left")
-        elif cmd == CMD_SCROLL:
-            if not args:
-                return True
-            dy = int(args[0].strip())
-            pyautogui.scroll(dy)
-        else:
-            log.warning("Unknown command: %s", cmd)
-    except Exception as e:
-        log.exception("pyautogui command failed: %s %s", cmd, args)
-    return True
-
-
 # Unix socket in the user's home so the user can always unlink it (no root-owned /tmp file)
 def _socket_path(uid=None):
-    if uid is None:
-        uid = os.getuid()
-    return os.path.join(pwd.getpwuid(int(uid)).pw_dir, ".keyboardmouse.sock")
+    return socket_path(uid)
 
 
 def _init_pynput():
@@ -301,77 +224,550 @@ def _init_pynput():
     try:
         from pynput import keyboard, mouse
         from pynput.keyboard import Key
+        from pynput.mouse import Button
     except ImportError:
         print("pynput not found. Install: pip install pynput")
         sys.exit(1)
-    return keyboard.Controller(), mouse.Controller(), Key
-
-
-def _handle_command(keyboard_controller, mouse_controller, Key, cmd: str, args: list[str]) -> bool:
-    """Execute one command. Returns False to stop processing."""
-    KEY_MAP = {
-        "enter": Key.enter, "return": Key.enter,
-        "tab": Key.tab, "space": Key.space, "backspace": Key.backspace,
-        "escape": Key.esc, "esc": Key.esc,
-        "shift": Key.shift, "ctrl": Key.ctrl, "control": Key.ctrl,
-        "alt": Key.alt, "cmd": Key.cmd, "command": Key.cmd, "win": Key.cmd,
-        "up": Key.up, "down": Key.down, "left": Key.left, "right": Key.right,
-        "home": Key.home, "end": Key.end,
-        "pageup": Key.page_up, "pagedown": Key.page_down,
-        "insert": Key.insert, "delete": Key.delete,
-        "caps_lock": Key.caps_lock, "num_lock": Key.num_lock,
-        "scroll_lock": Key.scroll_lock,
-    }
+    return keyboard.Controller(), mouse.Controller(), Key, Button
+
+
+# Server-internal event: absolute move in pixels (MOVE_ABS is converted using ScreenGeometry)
+MOVE_TO = "MOVE_TO"
+
+
+class InputBackend:
+    """
+    Base class for input injectors. A backend is probed, opened once, then fed events:
+    (cmd, args) tuples as returned by parse_command(), plus (MACRO_DELAY, [ms]) inside macros.
+
+    Subclasses implement inject() for one event. Backends with a native batch form
+    (one process spawn, one syscall) also override compile(); the pipeline hands each
+    decoded burst to inject_batch() in one call.
+    """
 
-    def key_from_string(name: str):
+    name = "base"
+    absolute = False  # MOVE_TO (absolute pixels) is supported
+
+    @classmethod
+    def probe(cls) -> bool:
+        """True if this backend can control the screen here. Must be cheap and side-effect free."""
+        return False
+
+    def open(self):
+        """Prepare the backend (imports, controllers, settings). Called once before injecting."""
+
+    def close(self):
+        """Release anything open() acquired."""
+
+    def screen_size(self):
+        """(width, height) of the screen in pixels, or None if this backend can't tell."""
+        return None
+
+    def warm_up(self):
+        """Pay first-use costs (lazy imports, display connection, binary load) before the
+        server reports ready. A zero-length relative move goes through the whole path
+        without visible effect."""
+        self.inject_batch([(CMD_MOUSE_MOVE, ["0,0"])])
+
+    def inject(self, cmd: str, args: list[str]) -> bool:
+        """Execute one command. Returns False to stop processing."""
+        raise NotImplementedError
+
+    def inject_batch(self, events) -> bool:
+        """Execute events in order. Returns False to stop processing."""
+        for cmd, args in events:
+            if cmd == MACRO_DELAY:
+                time.sleep(int(args[0]) / 1000)
+            elif not self.inject(cmd, args):
+                return False
+        return True
+
+    def compile(self, events):
+        """Return a zero-arg callable that injects events; done once for macros, reused per run."""
+        events = list(events)
+        return lambda: self.inject_batch(events)
+
+
+class XdotoolBackend(InputBackend):
+    """Inject key/mouse via xdotool so they actually control the screen (X11).
+    A batch becomes ONE chained xdotool invocation."""
+
+    name = "xdotool"
+    absolute = True
+
+    def __init__(self):
+        self.env = {**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")}
+
+    @classmethod
+    def probe(cls):
+        env = {**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")}
+        try:
+            r = subprocess.run(["xdotool", "getmouselocation"], env=env, capture_output=True, timeout=2)
+            return r.returncode == 0
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            return False
+
+    @staticmethod
+    def _args(cmd: str, args: list[str]) -> list[str]:
+        """xdotool sub-command tokens for one event ([] = nothing to do)."""
+        if cmd in (CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP):
+            if not args:
+                return []
+            name = args[0].strip().lower()
+            key = XDOTOOL_KEYS.get(name, name if len(name) == 1 else None)
+            if key is None:
+                return []
+            return [{CMD_KEY: "key", CMD_KEY_DOWN: "keydown", CMD_KEY_UP: "keyup"}[cmd], key]
+        if cmd == CMD_MOUSE_MOVE:
+            if not args or "," not in args[0]:
+                return []
+            dx, dy = args[0].strip().split(",", 1)
+            return ["mousemove_relative", "--", str(int(dx.strip())), str(int(dy.strip()))]
+        if cmd == MOVE_TO:
+            x, y = args[0].split(",", 1)
+            return ["mousemove", str(int(x)), str(int(y))]
+        if cmd == CMD_MOUSE_CLICK:
+            btn = (args or ["left"])[0].strip().lower()
+            return ["click", "3" if btn == "right" else ("2" if btn == "middle" else "1")]
+        if cmd == CMD_SCROLL:
+            if not args:
+                return []
+            dy = int(args[0].strip())
+            count = min(max(abs(dy), 1), 20)
+            return ["click", "--repeat", str(count), "--delay", "1", "4" if dy > 0 else "5"]
+        if cmd == MACRO_DELAY:
+            return ["sleep", f"{int(args[0]) / 1000:g}"]
+        log.warning("Unknown command: %s", cmd)
+        return []
+
+    def compile(self, events):
+        argv = []
+        for cmd, args in events:
+            try:
+                argv += self._args(cmd, args)
+            except (ValueError, IndexError):
+                log.warning("xdotool: bad arguments: %s %s", cmd, args)
+        if not argv:
+            return lambda: True
+        env = self.env
+        return lambda: _xdotool_run(env, *argv) or True
+
+    def inject_batch(self, events):
+        return self.compile(events)()
+
+    def inject(self, cmd, args):
+        return self.inject_batch([(cmd, args)])
+
+    def screen_size(self):
+        try:
+            r = subprocess.run(["xdotool", "getdisplaygeometry"], env=self.env, capture_output=True, timeout=2)
+            width, height = r.stdout.decode().split()
+            return int(width), int(height)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            return None
+
+
+class YdotoolBackend(InputBackend):
+    """Inject key/mouse via ydotool (Wayland and X11). Runs of key events in a batch
+    become one 'ydotool key' call carrying all the evdev codes."""
+
+    name = "ydotool"
+
+    @classmethod
+    def probe(cls):
+        return _ydotool_available()
+
+    def compile(self, events):
+        calls = []  # ydotool argv lists, or float seconds to sleep
+        keys = []
+
+        def flush_keys():
+            if keys:
+                calls.append(["key"] + keys)
+                keys.clear()
+
+        for cmd, args in events:
+            try:
+                if cmd in (CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP):
+                    if not args:
+                        continue
+                    name = args[0].strip().lower()
+                    code = YDOTOOL_KEYCODES.get(name)
+                    if code is None:
+                        if cmd == CMD_KEY and len(name) == 1:
+                            # Use 'type' for single chars
+                            flush_keys()
+                            calls.append(["type", name])
+                        continue
+                    if cmd != CMD_KEY_UP:
+                        keys.append(f"{code}:1")
+                    if cmd != CMD_KEY_DOWN:
+                        keys.append(f"{code}:0")
+                    continue
+                flush_keys()
+                if cmd == MACRO_DELAY:
+                    calls.append(int(args[0]) / 1000)
+                elif cmd == CMD_MOUSE_MOVE:
+                    if not args or "," not in args[0]:
+                        continue
+                    dx, dy = args[0].strip().split(",", 1)
+                    calls.append(["mousemove", str(int(dx.strip())), str(int(dy.strip()))])
+                elif cmd == CMD_MOUSE_CLICK:
+                    btn = (args or ["left"])[0].strip().lower()
+                    # ydotool click: 0x00=left, 0x01=right, 0x02=middle
+                    calls.append(["click", "0x00" if btn == "left" else ("0x01" if btn == "right" else "0x02")])
+                elif cmd == CMD_SCROLL:
+                    if not args:
+                        continue
+                    dy = int(args[0].strip())
+                    # Scroll: 0x04=scroll up, 0x05=scroll down (ydotool click)
+                    calls += [["click", "0x04" if dy > 0 else "0x05"]] * min(max(abs(dy), 1), 20)
+                else:
+                    log.warning("Unknown command: %s", cmd)
+            except (ValueError, IndexError):
+                log.warning("ydotool: bad arguments: %s %s", cmd, args)
+        flush_keys()
+
+        def run():
+            for c in calls:
+                if isinstance(c, float):
+                    time.sleep(c)
+                else:
+                    _ydotool_run(*c)
+            return True
+        return run
+
+    def inject_batch(self, events):
+        return self.compile(events)()
+
+    def inject(self, cmd, args):
+        return self.inject_batch([(cmd, args)])
+
+
+class PyautoguiBackend(InputBackend):
+    """Inject key/mouse via pyautogui (often works where xdotool/ydotool fail)."""
+
+    name = "pyautogui"
+    absolute = True
+
+    @classmethod
+    def probe(cls):
+        return _pyautogui_available()
+
+    def open(self):
+        import pyautogui
+        pyautogui.FAILSAFE = False  # allow remote control without corner trigger
+        pyautogui.PAUSE = 0  # default sleeps 0.1 s after every call
+        self.pyautogui = pyautogui
+
+    def screen_size(self):
+        width, height = self.pyautogui.size()
+        return int(width), int(height)
+
+    def inject(self, cmd, args):
+        pyautogui = self.pyautogui
+        try:
+            if cmd == CMD_KEY:
+                if not args:
+                    return True
+                name = args[0].strip().lower()
+                key = PYAUTOGUI_KEYS.get(name)
+                if key:
+                    pyautogui.press(key)
+                elif len(name) == 1:
+                    pyautogui.write(name)
+            elif cmd == CMD_KEY_DOWN:
+                if not args:
+                    return True
+                key = PYAUTOGUI_KEYS.get(args[0].strip().lower())
+                if key:
+                    pyautogui.keyDown(key)
+            elif cmd == CMD_KEY_UP:
+                if not args:
+                    return True
+                key = PYAUTOGUI_KEYS.get(args[0].strip().lower())
+                if key:
+                    pyautogui.keyUp(key)
+            elif cmd == CMD_MOUSE_MOVE:
+                if not args or "," not in args[0]:
+                    return True
+                dx, dy = args[0].strip().split(",", 1)
+                dx, dy = int(dx.strip()), int(dy.strip())
+                pyautogui.moveRel(dx, dy, duration=0)  # dy > 0 is down, as for the other backends
+            elif cmd == MOVE_TO:
+                x, y = args[0].split(",", 1)
+                pyautogui.moveTo(int(x), int(y), duration=0)
+            elif cmd == CMD_MOUSE_CLICK:
+                btn = (args or ["left"])[0].strip().lower()
+                if btn == "right":
+                    pyautogui.click(button="right")
+                elif btn == "middle":
+                    pyautogui.click(button="middle")
+                else:
+                    pyautogui.click(button="left")
+            elif cmd == CMD_SCROLL:
+                if not args:
+                    return True
+                dy = int(args[0].strip())
+                pyautogui.scroll(dy)
+            else:
+                log.warning("Unknown command: %s", cmd)
+        except Exception as e:
+            M_BACKEND_ERRORS.inc(self.name)
+            log.exception("pyautogui command failed: %s %s", cmd, args)
+        return True
+
+
+class PynputBackend(InputBackend):
+    """Inject key/mouse via pynput controllers."""
+
+    name = "pynput"
+    absolute = True
+
+    @classmethod
+    def probe(cls):
+        try:
+            import pynput  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def open(self):
+        self.keyboard, self.mouse, Key, self.Button = _init_pynput()
+        self.key_map = {
+            "enter": Key.enter, "return": Key.enter,
+            "tab": Key.tab, "space": Key.space, "backspace": Key.backspace,
+            "escape": Key.esc, "esc": Key.esc,
+            "shift": Key.shift, "ctrl": Key.ctrl, "control": Key.ctrl,
+            "alt": Key.alt, "cmd": Key.cmd, "command": Key.cmd, "win": Key.cmd,
+            "up": Key.up, "down": Key.down, "left": Key.left, "right": Key.right,
+            "home": Key.home, "end": Key.end,
+            "pageup": Key.page_up, "pagedown": Key.page_down,
+            "insert": Key.insert, "delete": Key.delete,
+            "caps_lock": Key.caps_lock, "num_lock": Key.num_lock,
+            "scroll_lock": Key.scroll_lock,
+        }
+
+    def _key(self, name: str):
         n = name.strip().lower()
-        if n in KEY_MAP:
-            return KEY_MAP[n]
+        if n in self.key_map:
+            return self.key_map[n]
         if len(n) == 1:
             return n
         return name
 
-    try:
-        if cmd == CMD_KEY:
-            if not args:
-                return True
-            k = key_from_string(args[0])
-            keyboard_controller.press(k)
-            keyboard_controller.release(k)
-        elif cmd == CMD_KEY_DOWN:
-            if not args:
-                return True
-            keyboard_controller.press(key_from_string(args[0]))
-        elif cmd == CMD_KEY_UP:
-            if not args:
-                return True
-            keyboard_controller.release(key_from_string(args[0]))
-        elif cmd == CMD_MOUSE_MOVE:
-            if not args:
-                return True
-            part = args[0]
-            if "," in part:
-                dx, dy = part.split(",", 1)
-                dx, dy = int(dx.strip()), int(dy.strip())
-                mouse_controller.move(dx, dy)
+    def inject(self, cmd, args):
+        try:
+            if cmd == CMD_KEY:
+                if not args:
+                    return True
+                k = self._key(args[0])
+                self.keyboard.press(k)
+                self.keyboard.release(k)
+            elif cmd == CMD_KEY_DOWN:
+                if not args:
+                    return True
+                self.keyboard.press(self._key(args[0]))
+            elif cmd == CMD_KEY_UP:
+                if not args:
+                    return True
+                self.keyboard.release(self._key(args[0]))
+            elif cmd == CMD_MOUSE_MOVE:
+                if not args:
+                    return True
+                part = args[0]
+                if "," in part:
+                    dx, dy = part.split(",", 1)
+                    dx, dy = int(dx.strip()), int(dy.strip())
+                    self.mouse.move(dx, dy)
+            elif cmd == MOVE_TO:
+                x, y = args[0].split(",", 1)
+                self.mouse.position = (int(x), int(y))
+            elif cmd == CMD_MOUSE_CLICK:
+                btn = (args or ["left"])[0].strip().lower()
+                button = self.Button.left
+                if btn == "right":
+                    button = self.Button.right
+                elif btn == "middle":
+                    button = self.Button.middle
+                self.mouse.click(button)
+            elif cmd == CMD_SCROLL:
+                if not args:
+                    return True
+                dy = int(args[0].strip())
+                self.mouse.scroll(0, dy)
+            else:
+                log.warning("Unknown command: %s", cmd)
+        except Exception as e:
+            M_BACKEND_ERRORS.inc(self.name)
+            log.exception("Command failed: %s %s", cmd, args)
+        return True
+
+
+class NullBackend(InputBackend):
+    """Counts events instead of injecting them (BACKEND=null): load tests and benchmarks."""
+
+    name = "null"
+
+    def __init__(self):
+        self.events = 0
+        self.batches = 0
+        self.last = None  # most recent event, so a driver can wait for a sentinel
+
+    @classmethod
+    def probe(cls):
+        return True
+
+    def warm_up(self):
+        pass  # keep event counts exact for benchmarks
+
+    def inject(self, cmd, args):
+        self.events += 1
+        self.last = (cmd, args)
+        return True
+
+    def inject_batch(self, events):
+        if events:
+            self.events += len(events)
+            self.batches += 1
+            self.last = events[-1]
+        return True
+
+
+class MpxBackend(InputBackend):
+    """One connection's own XInput2 master pointer/keyboard (MPX=1, see mpx.py): XTest from
+    an X connection whose ClientPointer is that master. Opened per connection and closed
+    (master removed) on disconnect; not a BACKEND= choice."""
+
+    name = "mpx"
+    absolute = True
+    _serials = itertools.count(1)  # next() is atomic: connections open masters concurrently
+
+    @classmethod
+    def probe(cls):
+        return mpx.available()
+
+    def open(self):
+        self.master = mpx.MasterPair(f"kbm-{os.getpid()}-{next(MpxBackend._serials)}")
+        try:
+            self.x = mpx.XTestClient(self.master.pointer_id)
+        except OSError:
+            self.master.close()
+            raise
+
+    def close(self):
+        self.x.close()
+        self.master.close()
+
+    def screen_size(self):
+        return self.x.screen_size()
+
+    def _key(self, args, press):
+        name = args[0].strip().lower() if args else ""
+        code = self.x.keycode(XDOTOOL_KEYS.get(name, name)) if name else 0
+        if not code:
+            log.warning("mpx: no keycode for %r", name)
+            return
+        self.x.key(code, press)
+
+    def _event(self, cmd, args):
+        if cmd in (CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP):
+            if cmd != CMD_KEY_UP:
+                self._key(args, True)
+            if cmd != CMD_KEY_DOWN:
+                self._key(args, False)
+        elif cmd == CMD_MOUSE_MOVE and args and "," in args[0]:
+            dx, dy = args[0].strip().split(",", 1)
+            self.x.move_rel(int(dx.strip()), int(dy.strip()))
+        elif cmd == MOVE_TO:
+            x, y = args[0].split(",", 1)
+            self.x.move_to(int(x), int(y))
         elif cmd == CMD_MOUSE_CLICK:
             btn = (args or ["left"])[0].strip().lower()
-            button = mouse.Button.left
-            if btn == "right":
-                button = mouse.Button.right
-            elif btn == "middle":
-                button = mouse.Button.middle
-            mouse_controller.click(button)
-        elif cmd == CMD_SCROLL:
-            if not args:
-                return True
+            number = 3 if btn == "right" else (2 if btn == "middle" else 1)
+            self.x.button(number, True)
+            self.x.button(number, False)
+        elif cmd == CMD_SCROLL and args:
             dy = int(args[0].strip())
-            mouse_controller.scroll(0, dy)
+            for _ in range(min(max(abs(dy), 1), 20)):
+                self.x.button(4 if dy > 0 else 5, True)
+                self.x.button(4 if dy > 0 else 5, False)
         else:
             log.warning("Unknown command: %s", cmd)
-    except Exception as e:
-        log.exception("Command failed: %s %s", cmd, args)
-    return True
+
+    def inject(self, cmd, args):
+        return self.inject_batch([(cmd, args)])
+
+    def inject_batch(self, events):
+        # Requests are buffered by Xlib; one flush per batch
+        for cmd, args in events:
+            try:
+                if cmd == MACRO_DELAY:
+                    self.x.flush()
+                    time.sleep(int(args[0]) / 1000)
+                else:
+                    self._event(cmd, args)
+            except (ValueError, IndexError):
+                log.warning("mpx: bad arguments: %s %s", cmd, args)
+        self.x.flush()
+        return True
+
+
+class SplitBackend(InputBackend):
+    """Pointer events through one backend and key events through another, when calibration
+    found different winners (CALIBRATE_SPLIT=1). Takes two opened backends; a batch is cut
+    into in-order runs, one call per run."""
+
+    def __init__(self, pointer, keys):
+        self.pointer = pointer
+        self.keys = keys
+        self.name = f"{pointer.name}+{keys.name}"
+        self.absolute = pointer.absolute
+
+    def close(self):
+        self.pointer.close()
+        self.keys.close()
+
+    def screen_size(self):
+        return self.pointer.screen_size()
+
+    def warm_up(self):
+        self.pointer.warm_up()
+        self.keys.warm_up()
+
+    def _runs(self, events):
+        """[(backend, events), ...] in order; a MACRO_DELAY stays with the run it follows."""
+        runs = []
+        for cmd, args in events:
+            if cmd == MACRO_DELAY and runs:
+                target = runs[-1][0]
+            else:
+                target = self.keys if cmd in (CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP) else self.pointer
+            if runs and runs[-1][0] is target:
+                runs[-1][1].append((cmd, args))
+            else:
+                runs.append((target, [(cmd, args)]))
+        return runs
+
+    def inject(self, cmd, args):
+        return self.inject_batch([(cmd, args)])
+
+    def inject_batch(self, events):
+        return all(target.inject_batch(run) for target, run in self._runs(events))
+
+    def compile(self, events):
+        compiled = [target.compile(run) for target, run in self._runs(events)]
+        return lambda: all(run() for run in compiled)
+
+
+# BACKEND= values -> implementation
+BACKENDS = {
+    "pyautogui": PyautoguiBackend,
+    "xdotool": XdotoolBackend,
+    "ydotool": YdotoolBackend,
+    "pynput": PynputBackend,
+    "null": NullBackend,
+}
 
 
 def _print_input_diagnostic():
@@ -427,227 +823,1230 @@ def _print_input_diagnostic():
     print("---")
 
 
-def run_user_server():
-    """Run as your user: listen on Unix socket, inject input via ydotool (Wayland), xdotool (X11), or pynput."""
-    _print_input_diagnostic()
+def _calibrated_backend(session):
+    """Fastest correct backend from calibration.py (saved result, or measured now); opened.
+    None if nothing works, so the fixed order and its hints take over."""
+    names = ["pyautogui", "xdotool"] + (["ydotool"] if session == "wayland" else ["pynput"])
+    candidates = {name: BACKENDS[name] for name in names}
+    choice = None if os.environ.get("CALIBRATE", "").strip() == "1" else calibration.load(candidates)
+    opened = {}
+    if choice is not None:
+        # Saved result for this session: open the chosen backends without measuring
+        for name in set(choice.values()):
+            backend = candidates[name]()
+            try:
+                if not candidates[name].probe():
+                    raise RuntimeError("probe failed")
+                backend.open()
+            except Exception as e:
+                log.info("Saved backend choice %s no longer works (%s); calibrating", name, e)
+                for b in opened.values():
+                    b.close()
+                choice, opened = None, {}
+                break
+            opened[name] = backend
+    if choice is None:
+        start = time.perf_counter()
+        choice, opened, results = calibration.calibrate(candidates, M_BACKEND_ERRORS.value)
+        log.info("Backend calibration took %.0f ms", (time.perf_counter() - start) * 1000)
+        if choice is None:
+            return None
+        calibration.save(candidates, results, choice)
+        for name, r in results.items():
+            print(f">>> Calibration: {name:<9} " + (
+                r["error"] if "error" in r else f"pointer {r['pointer']:.2f} ms, keys {r['keys']:.2f} ms"))
+    pointer, keys = opened[choice["pointer"]], opened[choice["keys"]]
+    backend = pointer if pointer is keys else SplitBackend(pointer, keys)
+    print(f">>> Input backend: {backend.name} (fastest here; saved in {calibration.cache_path()})")
+    log.info("Using %s to control keyboard/mouse", backend.name)
+    return backend
 
+
+def _select_backend():
+    """Pick and open the input backend: BACKEND= forces one, else the calibrated fastest
+    (calibration.py), else pyautogui, xdotool, ydotool (Wayland), pynput."""
     session = os.environ.get("XDG_SESSION_TYPE", "")
     forced = os.environ.get("BACKEND", "").strip().lower()
     use_ydotool = _ydotool_available() or os.environ.get("USE_YDOTOOL", "")
     use_xdotool = _xdotool_available() or os.environ.get("USE_XDOTOOL", "")
-    handle = None
-
-    def try_pyautogui():
-        if _pyautogui_available():
-            print(">>> Input backend: pyautogui (commands will control the screen)")
-            log.info("Using pyautogui to control keyboard/mouse")
-            return lambda c, a: _handle_command_pyautogui(c, a)
-        return None
-
-    def try_xdotool():
-        env = {**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")}
-        r = subprocess.run(["xdotool", "getmouselocation"], env=env, capture_output=True, timeout=2)
-        if r.returncode == 0:
-            print(">>> Input backend: xdotool (commands will control the screen)")
-            log.info("Using xdotool to control keyboard/mouse")
-            return lambda c, a: _handle_command_xdotool(c, a)
-        return None
 
-    def try_ydotool():
-        if _ydotool_available():
-            print(">>> Input backend: ydotool (commands will control the screen)")
-            log.info("Using ydotool to control keyboard/mouse")
-            return lambda c, a: _handle_command_ydotool(c, a)
+    def try_backend(name):
+        cls = BACKENDS[name]
+        if cls.probe():
+            print(f">>> Input backend: {name} (commands will control the screen)")
+            log.info("Using %s to control keyboard/mouse", name)
+            return cls()
         return None
 
+    backend = None
     # Forced backend
-    if forced == "pyautogui":
-        handle = try_pyautogui()
-        if handle is None:
+    if forced == "null":
+        backend = try_backend("null")
+    elif forced == "pyautogui":
+        backend = try_backend("pyautogui")
+        if backend is None:
             print(">>> BACKEND=pyautogui but pyautogui failed. Install: pip install pyautogui")
-            kbd, mouse_ctrl, Key = _init_pynput()
-            handle = lambda c, a: _handle_command(kbd, mouse_ctrl, Key, c, a)
     elif forced == "xdotool":
-        handle = try_xdotool()
-        if handle is None:
+        backend = try_backend("xdotool")
+        if backend is None:
             print(">>> BACKEND=xdotool but xdotool failed. Install: sudo apt install xdotool (and use an X11 session for best results)")
-            kbd, mouse_ctrl, Key = _init_pynput()
-            handle = lambda c, a: _handle_command(kbd, mouse_ctrl, Key, c, a)
     elif forced == "ydotool":
-        handle = try_ydotool()
-        if handle is None:
+        backend = try_backend("ydotool")
+        if backend is None:
             print(">>> BACKEND=ydotool failed: ydotool not installed or ydotoold not running.")
             print(">>> Option A: Install ydotool (build from source): github.com/ReimuNotMoe/ydotool")
             print(">>>           Then run:  ydotoold &   and restart this server.")
             print(">>> Option B (easier): Use X11 + xdotool instead:")
             print(">>>           Log out → at login choose 'Ubuntu on Xorg' → log in")
             print(">>>           Then:  sudo apt install xdotool   and run  ./run_server.sh  (no BACKEND=)")
-            kbd, mouse_ctrl, Key = _init_pynput()
-            handle = lambda c, a: _handle_command(kbd, mouse_ctrl, Key, c, a)
+    elif forced == "pynput":
+        backend = try_backend("pynput")
+        if backend is None:
+            print(">>> BACKEND=pynput but pynput failed. Install: pip install pynput")
+    elif os.environ.get("CALIBRATE", "").strip() != "0":
+        backend = _calibrated_backend(session)
+        if backend is not None:
+            return backend
     # Auto: try pyautogui first (works on many setups), then xdotool (X11), then ydotool (Wayland)
-    else:
-        handle = try_pyautogui()
-        if handle is None:
-            handle = try_xdotool()
-        if handle is None and session == "wayland":
-            handle = try_ydotool()
-        if handle is None:
+    if backend is None and forced not in BACKENDS:
+        backend = try_backend("pyautogui")
+        if backend is None:
+            backend = try_backend("xdotool")
+        if backend is None and session == "wayland":
+            backend = try_backend("ydotool")
+        if backend is None:
             print(">>> Input backend: pynput (commands may only appear in terminal)")
             print(">>> Install one of:  pip install pyautogui   or   sudo apt install xdotool   (and use X11)")
-            kbd, mouse_ctrl, Key = _init_pynput()
-            handle = lambda c, a: _handle_command(kbd, mouse_ctrl, Key, c, a)
+    if backend is None:
+        backend = PynputBackend()
+    backend.open()
+    return backend
 
-    path = _socket_path()
-    if os.path.exists(path):
-        try:
-            os.unlink(path)
-        except PermissionError:
-            log.error("Cannot remove %s (owned by root?). Remove it: sudo rm %s", path, path)
-            sys.exit(1)
-    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    sock.bind(path)
-    sock.listen(1)
+
+def _watch_screen_changes(on_change) -> bool:
+    """Call on_change() after each RandR screen change (monitor plugged in, resolution
+    changed), from a daemon thread blocked on its own X connection (libXrandr via ctypes).
+    False if that is not possible here (no X display or no libXrandr)."""
+    paths = [ctypes.util.find_library(name) for name in ("X11", "Xrandr")]
+    if not all(paths):
+        return False
     try:
-        os.chmod(path, 0o777)
+        x11, xrandr = (ctypes.CDLL(path) for path in paths)
     except OSError:
-        pass
-    log.info("User server listening on %s", path)
+        return False
+    x11.XOpenDisplay.argtypes, x11.XOpenDisplay.restype = [ctypes.c_char_p], ctypes.c_void_p
+    x11.XDefaultRootWindow.argtypes, x11.XDefaultRootWindow.restype = [ctypes.c_void_p], ctypes.c_ulong
+    x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    x11.XPending.argtypes = [ctypes.c_void_p]
+    xrandr.XRRSelectInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int]
+    dpy = x11.XOpenDisplay(os.environ.get("DISPLAY", ":0").encode())
+    if not dpy:
+        return False
+    xrandr.XRRSelectInput(dpy, x11.XDefaultRootWindow(dpy), 1)  # RRScreenChangeNotifyMask
 
-    while True:
+    def run():
+        event = ctypes.create_string_buffer(192)  # sizeof(XEvent)
+        while True:
+            x11.XNextEvent(dpy, event)
+            time.sleep(0.2)  # a hotplug comes as several events: settle, then query once
+            while x11.XPending(dpy):
+                x11.XNextEvent(dpy, event)
+            on_change()
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
+
+class ScreenGeometry:
+    """
+    Screen size and monitor layout for MOVE_ABS, cached. It is refreshed when X reports a
+    screen change (RandR), when a phone connects, and when MOVE_ABS names a monitor it does
+    not know, so nothing is queried per event or on a timer; on_change listeners hear about
+    new layouts. GEOMETRY_POLL_S=<s> adds a poll where RandR events are not available.
+    """
+
+    _XRANDR_MONITOR = re.compile(r"(\d+)/\d+x(\d+)/\d+\+(\d+)\+(\d+)")
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.width = self.height = 0
+        self.monitors = []  # [(x, y, w, h), ...]
+        self.listeners = []
+        self.queried = 0.0  # monotonic time of the last query
+        self.started = False
+        self._lock = threading.Lock()
+
+    def _query(self):
+        """(width, height, monitors) from xrandr, else the backend's screen size, else None."""
         try:
-            conn, _ = sock.accept()
-            log.info("Relay connected")
-            buffer = b""
-            pending_dx, pending_dy = 0, 0  # batch consecutive MOVEs into one for lower latency
+            r = subprocess.run(
+                ["xrandr", "--listmonitors"],
+                env={**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")},
+                capture_output=True, timeout=2,
+            )
+            monitors = [
+                (int(x), int(y), int(w), int(h))
+                for w, h, x, y in self._XRANDR_MONITOR.findall(r.stdout.decode("utf-8", errors="replace"))
+            ]
+            if r.returncode == 0 and monitors:
+                return max(x + w for x, _, w, _ in monitors), max(y + h for _, y, _, h in monitors), monitors
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        try:
+            size = self.backend.screen_size()
+        except Exception:
+            size = None
+        if size:
+            return size[0], size[1], [(0, 0, size[0], size[1])]
+        return None
 
-            def flush_move():
-                nonlocal pending_dx, pending_dy
-                if pending_dx != 0 or pending_dy != 0:
-                    handle(CMD_MOUSE_MOVE, [f"{pending_dx},{pending_dy}"])
-                    pending_dx, pending_dy = 0, 0
+    def refresh(self, max_age=0.0) -> bool:
+        """Re-query (unless the last query is younger than max_age seconds); returns True
+        (and notifies listeners) if the layout changed."""
+        if max_age and time.monotonic() - self.queried < max_age:
+            return False
+        self.queried = time.monotonic()
+        result = self._query()
+        if result is None:
+            return False
+        with self._lock:
+            if result == (self.width, self.height, self.monitors):
+                return False
+            self.width, self.height, self.monitors = result
+        log.info("Screen %dx%d, monitors: %s", self.width, self.height, self.monitors)
+        for listener in list(self.listeners):
+            listener(self.message())
+        return True
 
-            try:
+    def start(self):
+        """Query now and keep the layout current; once started, only refreshes."""
+        self.refresh()
+        if self.started:
+            return self
+        self.started = True
+        if not _watch_screen_changes(self.refresh):
+            log.info("No RandR screen change events here; screen layout refreshed on connect only")
+        interval = float(os.environ.get("GEOMETRY_POLL_S", 0))
+        if interval > 0:
+            def poll():
                 while True:
+                    time.sleep(interval)
+                    self.refresh()
+            threading.Thread(target=poll, daemon=True).start()
+        return self
+
+    def message(self) -> str:
+        with self._lock:
+            return encode_geometry(self.width, self.height, self.monitors)
+
+    def to_pixels(self, nx: float, ny: float, monitor=None):
+        """Normalized (0..1) coordinates -> pixels, on one monitor or the whole screen. None if unknown."""
+        with self._lock:
+            if monitor is not None and 0 <= monitor < len(self.monitors):
+                x, y, w, h = self.monitors[monitor]
+            elif self.width:
+                x, y, w, h = 0, 0, self.width, self.height
+            else:
+                return None
+        nx = min(max(nx, 0.0), 1.0)
+        ny = min(max(ny, 0.0), 1.0)
+        return x + round(nx * (w - 1)), y + round(ny * (h - 1))
+
+
+class _Peer:
+    """Write side of one relay connection: messages back to the phone."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, line: str):
+        data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
+        try:
+            with self.lock:
+                self.conn.sendall(data)
+        except OSError:
+            pass  # relay gone; the connection loop notices on its next recv
+
+
+class _Client:
+    """One phone as the control socket lists it: a relay connection, or two (pointer and key
+    streams, see --pointer-lane) that share a LANE token, a sink and this record."""
+
+    def __init__(self, cid, sink, token=""):
+        self.id = cid
+        self.sink = sink
+        self.token = token
+        self.since = time.monotonic()
+        self.lines = 0
+        self.connections = 0
+        self.repeaters = []
+
+
+# Keys that KEY_DOWN holds instead of auto-repeating (chords need them held)
+MODIFIER_KEYS = {
+    "shift", "ctrl", "control", "alt", "cmd", "command", "win",
+    "caps_lock", "num_lock", "scroll_lock",
+}
+
+
+class KeyRepeater:
+    """
+    Server-side auto-repeat for keys held with KEY_DOWN: after `delay` seconds the key is
+    tapped again every 1/rate seconds until KEY_UP or the connection closes. The phone sends
+    two messages per hold, and repeat timing no longer depends on radio jitter.
+    """
+
+    def __init__(self, tap, delay=0.4, rate=30.0):
+        self.tap = tap  # callable(key name): inject one press+release
+        self.delay = delay
+        self.interval = 1.0 / rate
+        self._held = {}  # key name -> next repeat time (monotonic)
+        self._cond = threading.Condition()
+        self._stop = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @classmethod
+    def from_env(cls, tap):
+        return cls(
+            tap,
+            delay=float(os.environ.get("KEY_REPEAT_DELAY_MS", 400)) / 1000,
+            rate=float(os.environ.get("KEY_REPEAT_RATE", 30)),
+        )
+
+    def configure(self, delay=None, rate=None):
+        """Change timing for keys pressed from now on; None keeps a value."""
+        with self._cond:
+            if delay is not None:
+                self.delay = delay
+            if rate is not None:
+                self.interval = 1.0 / rate
+
+    def press(self, name: str):
+        """Start repeating; the caller injects the first tap itself (in order with its batch)."""
+        with self._cond:
+            if name not in self._held:
+                self._held[name] = time.monotonic() + self.delay
+                self._cond.notify()
+
+    def release(self, name: str):
+        with self._cond:
+            self._held.pop(name, None)
+
+    def stop(self):
+        with self._cond:
+            self._held.clear()
+            self._stop = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop and not self._held:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                now = time.monotonic()
+                wait = min(self._held.values()) - now
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                due = [k for k, t in self._held.items() if t <= now]
+                for k in due:
+                    self._held[k] = max(self._held[k] + self.interval, now)
+            for k in due:
+                self.tap(k)
+
+
+def _observe_batch(backend, seconds, events: int):
+    """One backend call in the metrics; every injection path (batches, macros, gestures,
+    paste) records through here, so the two histograms count the same calls."""
+    M_BACKEND_SECONDS.observe(seconds, backend.name)
+    M_BATCH_EVENTS.observe(events)
+
+
+def _inject(backend, events) -> bool:
+    """Hand one batch to the backend and record it in the metrics. Returns False to stop."""
+    start = time.perf_counter()
+    ok = backend.inject_batch(events)
+    _observe_batch(backend, time.perf_counter() - start, len(events))
+    injected = {}
+    for c, _ in events:
+        label = _cmd_label(c)
+        injected[label] = injected.get(label, 0) + 1
+    for label, n in injected.items():
+        M_INJECTED.inc(label, amount=n)
+    return ok
+
+
+def _parse_move_abs(args):
+    """MOVE_ABS args -> (x, y, monitor or None) with x, y in 0..1, or None if malformed."""
+    if not args:
+        return None
+    try:
+        parts = args[0].split(",")
+        monitor = int(parts[2]) if len(parts) > 2 and parts[2].strip() else None
+        x, y = float(parts[0]), float(parts[1])
+    except (ValueError, IndexError):
+        return None
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return None  # nan/inf: round() would raise
+    return x, y, monitor
+
+
+class _Sink:
+    """Where a connection's events go: a backend, the lock every caller of it takes, and
+    the macros and gestures compiled for it (MACRO:<name> or GESTURE:<name> then costs one
+    call). Without MPX all connections share one sink; with MPX=1 each has its own, so one
+    phone's burst never waits for another's."""
+
+    def __init__(self, backend, macro_steps, smoothing=False):
+        self.macro_steps = macro_steps
+        # Backend calls come from the connection loop, the key repeater and, with
+        # SMOOTHING=1, the motion clock
+        self.lock = threading.Lock()
+        self.backend = backend
+        self.macros, self.gestures, self.paste = self._compile(backend)
+        self.smoother = None
+        if smoothing:
+            self.set_smoothing(True)
+
+    def _compile(self, backend):
+        """(macros, gestures, paste), each compiled as (callable, number of events)."""
+        def compiled(steps):
+            steps = list(steps)
+            return backend.compile(steps), sum(1 for cmd, _ in steps if cmd != MACRO_DELAY)
+
+        macros = {name: compiled(steps) for name, steps in self.macro_steps.items()}
+        gestures = {name: compiled(steps) for name, steps in load_gestures(self.macro_steps).items()}
+        return macros, gestures, compiled(paste_chord())
+
+    def inject(self, events, client="-") -> bool:
+        with self.lock:
+            if not TRACE.active:
+                return _inject(self.backend, events)
+            start = time.perf_counter()
+            ok = _inject(self.backend, events)
+        TRACE.record(client, "inject", f"{len(events)} events, {(time.perf_counter() - start) * 1000:.3f} ms")
+        return ok
+
+    def set_backend(self, backend):
+        """Inject through another (opened) backend from the next batch on; returns the old
+        one for the caller to close."""
+        compiled = self._compile(backend)
+        with self.lock:
+            old, self.backend = self.backend, backend
+            self.macros, self.gestures, self.paste = compiled
+        return old
+
+    def set_smoothing(self, on: bool):
+        with self.lock:
+            if on and self.smoother is None:
+                self.smoother = MotionSmoother.from_env(
+                    lambda dx, dy: self.inject([(CMD_MOUSE_MOVE, [f"{dx},{dy}"])])
+                ).start()
+            elif not on and self.smoother is not None:
+                smoother, self.smoother = self.smoother, None
+                smoother.stop()
+                dx, dy = smoother.settle()  # motion not emitted yet still reaches the cursor
+                if dx or dy:
+                    _inject(self.backend, [(CMD_MOUSE_MOVE, [f"{dx},{dy}"])])
+
+    def close(self):
+        if self.smoother is not None:
+            self.smoother.stop()
+        self.backend.close()
+
+
+def _open_mpx_sink(macro_steps, smoothing):
+    """A sink on a new master pointer/keyboard pair, or None (logged) if MPX is unusable."""
+    backend = MpxBackend()
+    try:
+        backend.open()
+    except OSError as e:
+        log.warning("MPX: no own pointer for this client (%s); sharing the main one", e)
+        return None
+    log.info("MPX: client got master %r", backend.master.name)
+    return _Sink(backend, macro_steps, smoothing)
+
+
+# Settings the control socket can change live: name -> default. `set` also updates the
+# environment variable of that name, so anything created later (connections, MPX sinks)
+# picks it up too
+CONTROL_SETTINGS = {
+    "COALESCE": "1",
+    "SMOOTHING": "0",
+    "SMOOTH_RATE": "60",
+    "SMOOTH_MIN_CUTOFF": "1.5",
+    "SMOOTH_BETA": "0.01",
+    "SMOOTH_EXTRAPOLATE_MS": "40",
+    "KEY_REPEAT_DELAY_MS": "400",
+    "KEY_REPEAT_RATE": "30",
+    "LOG_LEVEL": "INFO",
+}
+
+CONTROL_HELP = """\
+clients                  connected relays: id, time connected, lines received, backend
+backend [<name>]         show or switch the input backend (new batches use it at once)
+get [<NAME>]             current settings
+set <NAME> <value>       change a setting live: """ + ", ".join(CONTROL_SETTINGS) + """
+trace on [<path>]        append received lines and backend calls to a TSV file
+trace off                stop tracing
+histograms               p50/p95/p99 (bucket bounds) of every histogram
+metrics                  all metrics, Prometheus text format"""
+
+
+def _control_commands(shared, clients, live, geometry):
+    """Handlers for the control socket, bound to one running user server."""
+
+    def sinks():
+        found = {id(shared): shared}
+        for c in list(clients.values()):
+            found[id(c.sink)] = c.sink
+        return list(found.values())
+
+    def number(value, positive=False):
+        try:
+            v = float(value)
+        except ValueError:
+            raise ControlError(f"not a number: {value!r}")
+        if v < 0 or (positive and v == 0):
+            raise ControlError(f"out of range: {value}")
+        return v
+
+    def flag(value):
+        if value not in ("0", "1"):
+            raise ControlError("use 0 or 1")
+        return value == "1"
+
+    def set_coalesce(value):
+        live["coalesce"] = flag(value)
+
+    def set_smoothing(value):
+        live["smoothing"] = flag(value)
+        for sink in sinks():
+            sink.set_smoothing(live["smoothing"])
+
+    def smoother_setting(key, scale=1.0, positive=False):
+        def apply(value):
+            v = number(value, positive) * scale
+            for sink in sinks():
+                if sink.smoother is not None:
+                    sink.smoother.configure(**{key: v})
+        return apply
+
+    def repeat_setting(key, scale=1.0):
+        def apply(value):
+            v = number(value, positive=True) * scale
+            for c in list(clients.values()):
+                for repeater in list(c.repeaters):
+                    repeater.configure(**{key: v})
+        return apply
+
+    def set_log_level(value):
+        level = logging.getLevelName(value.upper())
+        if not isinstance(level, int):
+            raise ControlError(f"unknown log level {value!r}")
+        logging.getLogger().setLevel(level)
+
+    appliers = {
+        "COALESCE": set_coalesce,
+        "SMOOTHING": set_smoothing,
+        "SMOOTH_RATE": smoother_setting("rate", positive=True),
+        "SMOOTH_MIN_CUTOFF": smoother_setting("min_cutoff", positive=True),
+        "SMOOTH_BETA": smoother_setting("beta"),
+        "SMOOTH_EXTRAPOLATE_MS": smoother_setting("extrapolate_ms"),
+        "KEY_REPEAT_DELAY_MS": repeat_setting("delay", scale=0.001),
+        "KEY_REPEAT_RATE": repeat_setting("rate"),
+        "LOG_LEVEL": set_log_level,
+    }
+
+    def cmd_clients(args):
+        now = time.monotonic()
+        rows = []
+        for c in sorted(list(clients.values()), key=lambda c: c.id):
+            backend = c.sink.backend.name
+            if c.sink is not shared:
+                backend += f" (own master {c.sink.backend.master.name})"
+            streams = f"\t{c.connections} streams" if c.connections > 1 else ""
+            rows.append(f"{c.id}\t{now - c.since:.0f} s\t{c.lines} lines\t{backend}{streams}")
+        return "\n".join(rows) or "no clients"
+
+    def cmd_backend(args):
+        if not args:
+            return f"{shared.backend.name} (available: {', '.join(BACKENDS)})"
+        name = args[0].lower()
+        cls = BACKENDS.get(name)
+        if cls is None:
+            raise ControlError(f"unknown backend {name!r}; one of {', '.join(BACKENDS)}")
+        if name == shared.backend.name:
+            return f"already using {name}"
+        if not cls.probe():
+            raise ControlError(f"{name} cannot control the screen here")
+        new = cls()
+        new.open()
+        new.warm_up()
+        old = shared.set_backend(new)
+        geometry.backend = new
+        if new.absolute:
+            geometry.start()  # MOVE_ABS needs the layout even if the old backend had none
+        old.close()
+        os.environ["BACKEND"] = name
+        log.info("Input backend switched: %s -> %s", old.name, name)
+        return f"{old.name} -> {name}"
+
+    def cmd_get(args):
+        names = [args[0].upper()] if args else list(CONTROL_SETTINGS)
+        if names[0] not in CONTROL_SETTINGS:
+            raise ControlError(f"unknown setting {args[0]!r}")
+        return "\n".join(f"{n}={os.environ.get(n, '').strip() or CONTROL_SETTINGS[n]}" for n in names)
+
+    def cmd_set(args):
+        if len(args) != 2:
+            raise ControlError("usage: set <NAME> <value>")
+        name, value = args[0].upper(), args[1]
+        if name not in appliers:
+            raise ControlError(f"unknown setting {args[0]!r}; one of {', '.join(CONTROL_SETTINGS)}")
+        appliers[name](value)
+        os.environ[name] = value
+        return f"{name}={value}"
+
+    def cmd_trace(args):
+        if not args:
+            return f"on ({TRACE.path}, {TRACE.records} records)" if TRACE.active else "off"
+        if args[0] == "on":
+            path = os.path.expanduser(args[1] if len(args) > 1 else "~/keyboardmouse-trace.tsv")
+            try:
+                TRACE.start(path)
+            except OSError as e:
+                raise ControlError(f"cannot open {path}: {e}")
+            return f"tracing to {path}"
+        if args[0] == "off":
+            return f"stopped, {TRACE.stop()} records"
+        raise ControlError("usage: trace [on [<path>] | off]")
+
+    def cmd_histograms(args):
+        rows = []
+        for h in metrics.histograms():
+            seconds = h.name.endswith("_seconds")
+            fmt = (lambda v: f"{v * 1000:.3g} ms") if seconds else (lambda v: f"{v:.3g}")
+            for labels in h.label_sets():
+                _, total, count = h.snapshot(*labels)
+                quantiles = " ".join(f"p{round(q * 100)}<={fmt(h.quantile(q, *labels))}" for q in (0.5, 0.95, 0.99))
+                where = ",".join(f"{n}={v}" for n, v in zip(h.labels, labels))
+                rows.append(f"{h.name}{'{' + where + '}' if where else ''} count={count} "
+                            f"mean={fmt(total / count)} {quantiles}")
+        return "\n".join(rows) or "no observations yet"
+
+    return {
+        "help": lambda args: CONTROL_HELP,
+        "clients": cmd_clients,
+        "backend": cmd_backend,
+        "get": cmd_get,
+        "set": cmd_set,
+        "trace": cmd_trace,
+        "histograms": cmd_histograms,
+        "metrics": lambda args: metrics.render(),
+    }
+
+
+def run_user_server(backend=None):
+    """Run as your user: listen on Unix socket, inject input via ydotool (Wayland), xdotool (X11), or pynput.
+    Pass an opened backend to skip detection (benchmarks). Each relay connection is served
+    in its own thread."""
+    if backend is None:
+        _print_input_diagnostic()
+        backend = _select_backend()
+    macro_steps = load_macros()
+    if os.environ.get("METRICS_PORT"):
+        metrics.start_http_server(int(os.environ["METRICS_PORT"]))
+
+    # Changed at runtime through the control socket
+    live = {
+        "smoothing": os.environ.get("SMOOTHING", "").strip() not in ("", "0"),
+        "coalesce": os.environ.get("COALESCE", "1").strip() != "0",
+    }
+    shared = _Sink(backend, macro_steps, live["smoothing"])
+    if shared.smoother is not None:
+        log.info("Pointer smoothing on (%.0f Hz)", 1 / shared.smoother.period)
+    use_mpx = os.environ.get("MPX", "").strip() not in ("", "0")
+    if use_mpx and not MpxBackend.probe():
+        log.warning("MPX=1 but XInput2 masters cannot be created here (needs X11, xinput, libXi, libXtst)")
+        use_mpx = False
+    elif use_mpx:
+        log.info("MPX on: each client gets its own pointer and keyboard focus")
+
+    # Screen layout for MOVE_ABS, cached; connected phones get it now and on every change
+    peers = set()
+    geometry = ScreenGeometry(backend)
+    geometry.listeners.append(lambda message: [p.send(message) for p in list(peers)])
+    if backend.absolute:
+        geometry.start()
+
+    start = time.perf_counter()
+    backend.warm_up()
+    log.info("Backend %s warmed up in %.1f ms", backend.name, (time.perf_counter() - start) * 1000)
+
+    clients = {}  # id -> _Client
+    lane_groups = {}  # LANE token -> _Client, so a phone's two streams share one sink
+    clients_lock = threading.Lock()
+    client_ids = itertools.count(1)
+
+    def join(token):
+        """The _Client for a new connection: the phone's existing one if its LANE token is known."""
+        with clients_lock:
+            client = lane_groups.get(token) if token else None
+            if client is not None:
+                client.connections += 1
+                return client
+        # Creating an MPX master runs xinput: not under the lock, which every connection takes
+        sink = (_open_mpx_sink(macro_steps, live["smoothing"]) if use_mpx else None) or shared
+        with clients_lock:
+            client = lane_groups.get(token) if token else None
+            if client is None:
+                client = _Client(next(client_ids), sink, token)
+                clients[client.id] = client
+                if token:
+                    lane_groups[token] = client
+                sink = None
+            client.connections += 1
+        if sink is not None and sink is not shared:
+            sink.close()  # the phone's other stream joined first and made its own
+        return client
+
+    def leave(client) -> bool:
+        """Drop one connection; True if it was the phone's last."""
+        with clients_lock:
+            client.connections -= 1
+            if client.connections:
+                return False
+            del clients[client.id]
+            if client.token:
+                lane_groups.pop(client.token, None)
+            return True
+
+    def serve(conn):
+        """One relay connection: decode its lines and inject them through its sink. Each
+        connection has its own thread, so a phone's pointer and key streams (LANE first
+        line) are decoded and injected independently."""
+        lane, buffer = read_first_line(conn, CMD_LANE)
+        token, _, role = (lane or "").partition(":")
+        client = join(token)
+        cid, sink = client.id, client.sink
+        log.info("Relay connected (client %d%s)", cid, f", {role} stream" if lane else "")
+        M_CONNECTIONS.inc()
+        peer = _Peer(conn)
+        if geometry.width and role != LANE_POINTER:
+            geometry.refresh()  # before peers.add: listeners would send it a second time
+        if role != LANE_POINTER:
+            peers.add(peer)  # messages to the phone go on its key stream
+        if geometry.width and role != LANE_POINTER:
+            peer.send(geometry.message())
+        pending_dx, pending_dy = 0, 0  # batch consecutive MOVEs into one for lower latency
+        events = []  # decoded burst, handed to the backend in one call
+        held_modifiers = set()  # released on disconnect so no Ctrl stays stuck
+        repeater = None
+        if os.environ.get("KEY_REPEAT", "1").strip() != "0":
+            repeater = KeyRepeater.from_env(lambda name: sink.inject([(CMD_KEY, [name])], cid))
+            client.repeaters.append(repeater)
+        received = {}  # per-burst command counts, added to M_RECEIVED once per burst
+        clip = ClipReceiver()
+
+        def flush_move():
+            nonlocal pending_dx, pending_dy
+            if pending_dx != 0 or pending_dy != 0:
+                smoother = sink.smoother  # may be switched on or off through the control socket
+                if smoother is not None:
+                    smoother.push(pending_dx, pending_dy)
+                else:
+                    events.append((CMD_MOUSE_MOVE, [f"{pending_dx},{pending_dy}"]))
+                pending_dx, pending_dy = 0, 0
+
+        def settle_move():
+            """Before a click/key: the pointer must be where the user left it."""
+            flush_move()
+            smoother = sink.smoother
+            if smoother is not None:
+                dx, dy = smoother.settle()
+                if dx or dy:
+                    events.append((CMD_MOUSE_MOVE, [f"{dx},{dy}"]))
+
+        def flush_events():
+            flush_move()
+            if not events:
+                return True
+            ok = sink.inject(events, cid)
+            events.clear()
+            return ok
+
+        def run_compiled(compiled, label, times=1):
+            """Inject a precompiled macro or gesture, after everything before it."""
+            run, size = compiled
+            settle_move()
+            ok = flush_events()
+            start = time.perf_counter()
+            with sink.lock:
+                for _ in range(times):
+                    run()
+                elapsed = time.perf_counter() - start
+                _observe_batch(sink.backend, elapsed, size * times)
+            M_INJECTED.inc(label, amount=times)
+            if TRACE.active:
+                TRACE.record(cid, "inject", f"{label} x{times}, {elapsed * 1000:.3f} ms")
+            return ok
+
+        try:
+            running = True
+            data, buffer = buffer, b""  # bytes read while looking for LANE come first
+            while running:
+                if not data:
                     data = conn.recv(4096)
                     if not data:
                         break
-                    buffer += data
-                    while b"\n" in buffer or b"\r" in buffer:
-                        for sep in (b"\n", b"\r"):
-                            if sep in buffer:
-                                line, buffer = buffer.split(sep, 1)
-                                break
-                        else:
+                arrived = time.perf_counter()
+                M_QUEUE_BYTES.set(_socket_backlog(conn))
+                buffer += data
+                data = b""
+                while b"\n" in buffer or b"\r" in buffer:
+                    for sep in (b"\n", b"\r"):
+                        if sep in buffer:
+                            line, buffer = buffer.split(sep, 1)
                             break
+                    else:
+                        break
+                    try:
+                        line_str = line.decode("utf-8").strip()
+                    except UnicodeDecodeError:
+                        continue
+                    if not line_str:
+                        continue
+                    if line_str.startswith(CMD_CLIP_DATA):
+                        log.debug("Received: %s (%d chars)", CMD_CLIP_DATA, len(line_str))  # may be a password
+                        if TRACE.active:
+                            TRACE.record(cid, "recv", f"{CMD_CLIP_DATA} ({len(line_str)} chars)")
+                    else:
+                        log.info("Received: %s", line_str)
+                        if TRACE.active:
+                            TRACE.record(cid, "recv", line_str)
+                    client.lines += 1
+                    parsed = parse_command(line_str)
+                    if not parsed:
+                        continue
+                    cmd, args = parsed
+                    label = _cmd_label(cmd)
+                    received[label] = received.get(label, 0) + 1
+                    if cmd == CMD_MOUSE_MOVE and args and "," in args[0]:
+                        part = args[0].strip()
+                        dx, dy = part.split(",", 1)
+                        pending_dx += int(dx.strip())
+                        pending_dy += int(dy.strip())
+                        if not live["coalesce"]:
+                            flush_move()
+                    elif cmd == CMD_MACRO:
+                        name = args[0].strip() if args else ""
+                        run_macro = sink.macros.get(name)
+                        if run_macro is None:
+                            log.warning("Unknown macro: %s", name)
+                        else:
+                            running = run_compiled(run_macro, CMD_MACRO)
+                    elif cmd == CMD_GESTURE:
+                        gesture = parse_gesture(args)
+                        if gesture is None:
+                            continue
+                        name, arg = gesture
+                        if name == GESTURE_SCROLL:
+                            # Plain scroll: batched with the rest of the burst
+                            settle_move()
+                            try:
+                                events.append((CMD_SCROLL, [str(int(arg))]))
+                            except ValueError:
+                                log.warning("Bad gesture: %s", line_str)
+                            continue
+                        run_gesture = sink.gestures.get(name)
+                        if run_gesture is None:
+                            log.warning("Unknown gesture: %s", name)
+                        else:
+                            running = run_compiled(run_gesture, CMD_GESTURE, repeat_count(arg) if arg else 1)
+                    elif cmd == CMD_PING:
+                        # Answer once everything before the PING is handed on; the reply
+                        # carries the laptop's share (burst read -> injected) in ms. Motion
+                        # held by the smoother stays there: settling it would jump the
+                        # pointer at every ping.
+                        running = flush_events()
+                        laptop_ms = (time.perf_counter() - arrived) * 1000
+                        peer.send(encode_command(MSG_PONG, args[0].strip() if args else "", f"{laptop_ms:.2f}"))
+                    elif cmd in CLIP_COMMANDS:
                         try:
-                            line_str = line.decode("utf-8").strip()
-                        except UnicodeDecodeError:
+                            done = clip.handle(cmd, args)
+                        except ClipError as e:
+                            log.warning("Clipboard transfer failed: %s", e)
+                            peer.send(encode_command(MSG_CLIP_ERROR, str(e)))
                             continue
-                        if not line_str:
+                        if done is None:
                             continue
-                        log.info("Received: %s", line_str)
-                        parsed = parse_command(line_str)
-                        if not parsed:
+                        text, paste_after = done
+                        settle_move()
+                        running = flush_events()
+                        if not set_clipboard(text):
+                            peer.send(encode_command(MSG_CLIP_ERROR, "no clipboard tool on the laptop"))
                             continue
-                        cmd, args = parsed
-                        if cmd == CMD_MOUSE_MOVE and args and "," in args[0]:
-                            part = args[0].strip()
-                            dx, dy = part.split(",", 1)
-                            pending_dx += int(dx.strip())
-                            pending_dy += int(dy.strip())
-                        else:
-                            flush_move()
-                            if not handle(cmd, args):
-                                break
-                    flush_move()
-            except (OSError, ConnectionResetError) as e:
-                log.info("Relay disconnected: %s", e)
-            finally:
-                conn.close()
+                        log.info("Clipboard set (%d bytes)", len(text))
+                        if paste_after:
+                            running = run_compiled(sink.paste, CMD_CLIP_END) and running
+                        peer.send(encode_command(MSG_CLIP_OK, str(len(text))))
+                    elif cmd == CMD_MOUSE_MOVE_ABS:
+                        settle_move()
+                        parsed_abs = _parse_move_abs(args)
+                        if parsed_abs and parsed_abs[2] is not None and parsed_abs[2] >= len(geometry.monitors):
+                            geometry.refresh(max_age=1.0)  # a monitor the phone knows and we don't yet
+                        target = geometry.to_pixels(*parsed_abs) if parsed_abs else None
+                        if target is None:
+                            continue
+                        if events and events[-1][0] == MOVE_TO:
+                            events.pop()  # absolute moves: only the newest in a burst matters
+                        events.append((MOVE_TO, [f"{target[0]},{target[1]}"]))
+                    else:
+                        settle_move()
+                        name = args[0].strip().lower() if args else ""
+                        if cmd == CMD_KEY_DOWN and name in MODIFIER_KEYS:
+                            held_modifiers.add(name)
+                        elif cmd == CMD_KEY_UP and name in MODIFIER_KEYS:
+                            held_modifiers.discard(name)
+                        elif cmd == CMD_KEY_DOWN and name and repeater is not None:
+                            # Held key: tap now, then the repeater taps until KEY_UP
+                            repeater.press(name)
+                            events.append((CMD_KEY, [name]))
+                            continue
+                        elif cmd == CMD_KEY_UP and name and repeater is not None:
+                            repeater.release(name)
+                            continue
+                        events.append((cmd, args))
+                running = flush_events() and running
+                for label, n in received.items():
+                    M_RECEIVED.inc(label, amount=n)
+                received.clear()
+        except (OSError, ConnectionResetError) as e:
+            log.info("Relay disconnected: %s", e)
+        except Exception as e:
+            log.exception("Error: %s", e)
+        finally:
+            M_CONNECTIONS.dec()
+            peers.discard(peer)
+            conn.close()
+            if repeater is not None:
+                repeater.stop()
+            if held_modifiers:
+                sink.inject([(CMD_KEY_UP, [m]) for m in held_modifiers], cid)
+            if repeater is not None:
+                client.repeaters.remove(repeater)
+            if leave(client) and sink is not shared:
+                sink.close()  # removes this phone's master pointer/keyboard
+
+    activated = listen_fds()
+    if activated:
+        # Socket activation: the launcher already bound and listens; connections made
+        # while we were starting wait in its backlog
+        sock = activated[0]
+        path = sock.getsockname()
+        log.info("User server using activated socket %s", path)
+    else:
+        path = _socket_path()
+        if os.path.exists(path):
+            try:
+                os.unlink(path)
+            except PermissionError:
+                log.error("Cannot remove %s (owned by root?). Remove it: sudo rm %s", path, path)
+                sys.exit(1)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen(8)
+        try:
+            os.chmod(path, 0o777)
+        except OSError:
+            pass
+        log.info("User server listening on %s", path)
+    control = None
+    if os.environ.get("CONTROL", "1").strip() != "0":
+        control = ControlServer(control_path(path), _control_commands(shared, clients, live, geometry)).start()
+    notify_ready(f"Listening on {path} ({backend.name})")
+
+    while True:
+        try:
+            conn, _ = sock.accept()
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
         except KeyboardInterrupt:
             break
         except Exception as e:
             log.exception("Error: %s", e)
 
     sock.close()
-    if os.path.exists(path):
-        os.unlink(path)
+    if control is not None:
+        control.close()
+    TRACE.stop()
+    shared.close()
+    if not activated and os.path.exists(path):
+        os.unlink(path)  # an activated socket belongs to the launcher
     log.info("User server stopped.")
 
 
-def run_bt_relay():
-    """Run as root (sudo): bind Bluetooth, forward bytes to user's Unix socket."""
+def _pump(src, dst):
+    """Copy bytes src -> dst until either side closes: user server messages back to the phone."""
     try:
-        import bluetooth
-        from bluetooth.btcommon import BluetoothError
-    except ImportError:
-        print("PyBluez is required. Install: pip install PyBluez")
-        print("On Ubuntu/Debian: sudo apt install libbluetooth-dev python3-dev")
-        sys.exit(1)
+        while True:
+            data = src.recv(4096)
+            if not data:
+                break
+            dst.sendall(data)
+    except OSError:
+        pass
 
-    path = _socket_path(os.environ.get("SUDO_UID", os.getuid()))
-    server_sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_sock.bind(("", 1))
-    server_sock.listen(1)
 
+def _connect_session(registry, client_sock, client_info, pending=b""):
+    """Route a new phone connection (HELLO line, device address, or default) to its user
+    server. Returns (connected Unix socket, bytes read after HELLO that the caller must
+    still forward), or (None, b"") (client closed) if no user server is running for it.
+    pending: bytes the caller already read from client_sock."""
+    hello, pending = read_hello(client_sock, data=pending)
+    address = client_info[0] if isinstance(client_info, tuple) else client_info
+    session, path = registry.resolve(address, hello)
+    if path is None:
+        running = sorted(registry.scan())
+        if running:
+            log.error("Several sessions (%s) and none chosen: send HELLO:<session> or list %s in %s",
+                      ", ".join(running), address, registry.routes_path)
+        else:
+            log.error("No user server socket found. Start it first: python laptop_server.py --user")
+        client_sock.close()
+        return None, b""
+    relay = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     try:
-        bluetooth.advertise_service(
-            server_sock,
-            "KeyboardMouse",
-            service_id=SPP_UUID,
-            service_classes=[SPP_UUID, bluetooth.SERIAL_PORT_CLASS],
-            profiles=[bluetooth.SERIAL_PORT_PROFILE],
-        )
-    except BluetoothError as e:
-        server_sock.close()
-        log.error("Bluetooth error: %s", e)
-        errmsg = str(e).lower()
-        print()
-        if "no advertisable device" in errmsg or "advertisable" in errmsg:
-            print("  Turn Bluetooth ON and make this PC discoverable:")
-            print("    • Settings → Bluetooth → turn ON, then set this device to visible/discoverable")
-            print("  Or from terminal:  bluetoothctl power on && bluetoothctl discoverable on")
-            print()
-        elif "permission denied" in errmsg or "errno 13" in errmsg:
-            print("  Run with sudo:  sudo ./venv/bin/python laptop_server.py --bt")
-        elif "no such file or directory" in errmsg or "errno 2" in errmsg:
-            print("  BlueZ SDP may need: sudo sdptool add SP  and bluetoothd -C")
-        print()
-        sys.exit(1)
+        relay.connect(path)
+    except OSError:
+        relay.close()
+        raise
+    log.info("Routing %s to session %s (%s)", address, session, path)
+    return relay, pending
 
-    log.info("Bluetooth relay listening on RFCOMM channel 1. Connect from the phone.")
 
+def _relay_client(registry, client_sock, client_info):
+    """Forward one phone connection to its user server until either side closes."""
+    try:
+        relay, pending = _connect_session(registry, client_sock, client_info)
+        if relay is None:
+            return
+        if pending:
+            relay.sendall(pending)
+        threading.Thread(target=_pump, args=(relay, client_sock), daemon=True).start()
+        try:
+            while True:
+                data = client_sock.recv(4096)
+                if not data:
+                    break
+                relay.sendall(data)
+        finally:
+            try:
+                relay.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            relay.close()
+    except (OSError, ConnectionResetError) as e:
+        log.info("Relay or client closed: %s", e)
+    finally:
+        client_sock.close()
+
+
+def _relay_accept_loop(transport, registry):
+    """Accept connections on one transport until it closes; each is forwarded in its own
+    thread, so several phones can be connected at once."""
     while True:
         try:
-            client_sock, client_info = server_sock.accept()
-            log.info("Connected from %s", client_info)
-            if not os.path.exists(path):
-                log.error("User server socket %s not found. Start it first: python laptop_server.py --user", path)
-                client_sock.close()
-                continue
+            client_sock, client_info = transport.accept()
+            log.info("Connected from %s (%s)", client_info, transport.describe())
+            threading.Thread(target=_relay_client, args=(registry, client_sock, client_info), daemon=True).start()
+        except (KeyboardInterrupt, TransportClosed):
+            break
+        except Exception as e:
+            log.exception("Error: %s", e)
+
+
+def run_bt_relay(transport=None, lane=None):
+    """Run as root (sudo): accept phone connections (RFCOMM unless --transport= says otherwise),
+    forward bytes to user's Unix socket. With --pointer-lane (or a lane transport passed in),
+    also accept each phone's pointer stream on a second channel; it is forwarded as its own
+    connection, so queued motion never delays keys."""
+    if transport is None:
+        transport = transport_from_argv(sys.argv)
+    registry = SessionRegistry(os.environ.get("SUDO_UID", os.getuid()))
+    transport.open()
+    if lane is None and "--pointer-lane" in sys.argv:
+        lane = transport.pointer_lane()
+        if lane is None:
+            log.warning("Transport %s has no pointer lane; using one stream per phone", transport.describe())
+    if lane is not None:
+        lane.open()
+        threading.Thread(target=_relay_accept_loop, args=(lane, registry), daemon=True).start()
+        log.info("Pointer lane on %s", lane.describe())
+    log.info("Relay listening on %s. Connect from the phone.", transport.describe())
+    notify_ready(f"Listening on {transport.describe()}")
+
+    _relay_accept_loop(transport, registry)
+
+    if lane is not None:
+        lane.close()
+    transport.close()
+    log.info("Relay stopped.")
+
+
+class _NetSession:
+    """One LAN client: its connection to the user server plus the newest motion applied."""
+
+    def __init__(self, relay):
+        self.relay = relay
+        self.send_lock = threading.Lock()  # TCP lines and UDP motion share one stream
+        self.seq = -1
+        self.x, self.y = 0, 0
+
+    def send(self, data: bytes):
+        with self.send_lock:
+            self.relay.sendall(data)
+
+    def _move_line(self, seq: int, x: int, y: int) -> bytes:
+        """MOVE line for newer totals, or b"" if stale. Caller holds send_lock."""
+        if seq <= self.seq:
+            return b""
+        dx, dy = x - self.x, y - self.y
+        self.seq, self.x, self.y = seq, x, y
+        if dx == 0 and dy == 0:
+            return b""
+        return f"{CMD_MOUSE_MOVE}:{dx},{dy}\n".encode("ascii")
+
+    def motion(self, seq: int, x: int, y: int):
+        """Apply a UDP motion datagram (dropped if older than what was applied)."""
+        with self.send_lock:
+            line = self._move_line(seq, x, y)
+            if line:
+                self.relay.sendall(line)
+
+    def send_lines(self, data: bytes):
+        """Forward whole TCP lines, turning MOTION:<seq>:<x>,<y> syncs into MOVE deltas."""
+        if NET_MOTION_SYNC.encode("ascii") + b":" in data:
+            out = []
+            for line in data.splitlines(keepends=True):
+                if line.startswith(NET_MOTION_SYNC.encode("ascii") + b":"):
+                    parsed = parse_motion(line[len(NET_MOTION_SYNC) + 1:])
+                    if parsed is not None:
+                        with self.send_lock:
+                            out.append(self._move_line(*parsed))
+                    continue
+                out.append(line)
+            data = b"".join(out)
+        if data:
+            self.send(data)
+
+
+def _net_motion_loop(udp, sessions, token=None):
+    """Receive UDP motion datagrams and forward them to the session of the sender's IP
+    (only datagrams signed with the token, if there is one)."""
+    while True:
+        try:
+            data, addr = udp.recvfrom(512)
+        except OSError:
+            break
+        parsed = parse_motion(data, token)
+        session = sessions.get(addr[0])
+        if parsed is None or session is None:
+            continue
+        try:
+            session.motion(*parsed)
+        except OSError:
+            pass
+
+
+def _net_client_loop(client_sock, client_addr, sessions, registry, token=None):
+    """Forward one TCP client's lines to the user server (whole lines only, so UDP motion
+    can be interleaved safely). With a token the first line must be AUTH:<token>."""
+    relay = None
+    session = None
+    try:
+        buffer = b""
+        if token:
+            offered, buffer = read_first_line(client_sock, CMD_AUTH, timeout=5)
+            if offered is None or not hmac.compare_digest(offered.encode("utf-8"), token.encode("utf-8")):
+                log.warning("Refused %s: no or wrong AUTH token", client_addr)
+                return
+        relay, buffer = _connect_session(registry, client_sock, client_addr, buffer)
+        if relay is None:
+            return
+        session = _NetSession(relay)
+        sessions[client_addr[0]] = session
+        threading.Thread(target=_pump, args=(relay, client_sock), daemon=True).start()
+        # Bytes read with HELLO go through the same line handling (MOTION syncs)
+        while True:
+            end = max(buffer.rfind(b"\n"), buffer.rfind(b"\r")) + 1
+            if end:
+                session.send_lines(buffer[:end])
+                buffer = buffer[end:]
+            data = client_sock.recv(4096)
+            if not data:
+                break
+            buffer += data
+    except (OSError, ConnectionResetError) as e:
+        log.info("Relay or client closed: %s", e)
+    finally:
+        if session is not None and sessions.get(client_addr[0]) is session:
+            del sessions[client_addr[0]]
+        if relay is not None:
             try:
-                relay = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                relay.connect(path)
-                try:
-                    while True:
-                        data = client_sock.recv(4096)
-                        if not data:
-                            break
-                        relay.sendall(data)
-                finally:
-                    relay.close()
-            except (OSError, ConnectionResetError) as e:
-                log.info("Relay or client closed: %s", e)
-            finally:
-                client_sock.close()
+                relay.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            relay.close()
+        client_sock.close()
+        log.info("Disconnected %s", client_addr)
+
+
+def run_net_relay():
+    """Run as your user: LAN transport. Keys/clicks arrive over TCP and pointer motion over
+    UDP (latest wins); both are forwarded to the user server's Unix socket."""
+    port = int(os.environ.get("NET_PORT", NET_PORT))
+    bind = os.environ.get("NET_BIND", "127.0.0.1")
+    token = os.environ.get("NET_TOKEN", "").strip()
+    if not token and bind not in ("127.0.0.1", "localhost"):
+        # Reachable from the network: never without a token
+        token = secrets.token_hex(4)
+        print(f">>> LAN token for this run: {token}  (in the app: {token}@<laptop ip>; NET_TOKEN= to fix it)")
+    registry = SessionRegistry()
+    sessions = {}  # client IP -> _NetSession
+
+    tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    tcp.bind((bind, port))
+    tcp.listen(5)
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.bind((bind, port))
+    threading.Thread(target=_net_motion_loop, args=(udp, sessions, token), daemon=True).start()
+    log.info("Network relay listening on %s:%d (TCP keys, UDP motion%s). Connect from the phone.",
+             bind, port, ", token required" if token else "")
+    if token:
+        log.warning("The token is sent in clear text; use the LAN relay on networks you trust only.")
+    notify_ready(f"Listening on {bind}:{port}")
+
+    while True:
+        try:
+            client_sock, client_addr = tcp.accept()
+            log.info("Connected from %s", client_addr)
+            client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(
+                target=_net_client_loop, args=(client_sock, client_addr, sessions, registry, token), daemon=True,
+            ).start()
         except KeyboardInterrupt:
             break
         except Exception as e:
             log.exception("Error: %s", e)
 
-    server_sock.close()
-    log.info("Bluetooth relay stopped.")
+    tcp.close()
+    udp.close()
+    log.info("Network relay stopped.")
 
 
 if __name__ == "__main__":
@@ -655,9 +2054,20 @@ if __name__ == "__main__":
         run_user_server()
     elif "--bt" in sys.argv:
         run_bt_relay()
+    elif "--net" in sys.argv:
+        run_net_relay()
+    elif "--ctl" in sys.argv:
+        command = " ".join(sys.argv[sys.argv.index("--ctl") + 1:]) or "help"
+        try:
+            print(request(control_path(_socket_path()), command))
+        except OSError as e:
+            print(f"Cannot reach the user server's control socket: {e}")
+            sys.exit(1)
     else:
         print("Usage:")
         print("  Terminal 1:  ./venv/bin/python laptop_server.py --user")
-        print("  Terminal 2:  sudo ./venv/bin/python laptop_server.py --bt")
+        print("  Terminal 2:  sudo ./venv/bin/python laptop_server.py --bt [--transport=rfcomm|tcp] [--pointer-lane]")
+        print("  (optional)   ./venv/bin/python laptop_server.py --net   (LAN: TCP keys + UDP motion)")
+        print("  (admin)      ./venv/bin/python laptop_server.py --ctl help   (retune a running user server)")
         print("Or run  ./run_server.sh  to start both.")
         sys.exit(0)
@@ -0,0 +1,85 @@
+"""
+Server-side macros: named command sequences loaded from a JSON file on the laptop.
+
+  {
+    "copy":  ["KEY_DOWN:ctrl", "KEY:c", "KEY_UP:ctrl"],
+    "nudge": ["MOVE:40,0", "DELAY:50", "MOVE:-40,0"]
+  }
+
+Each step is a protocol line (see protocol.py) or DELAY:<milliseconds>.
+A client triggers a whole macro with one line:  MACRO:<name>
+The user server compiles each macro for its input backend once, at load time.
+"""
+
+import json
+import logging
+import os
+
+from protocol import parse_command, CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP
+from protocol import CMD_MOUSE_MOVE, CMD_MOUSE_CLICK, CMD_SCROLL
+
+log = logging.getLogger(__name__)
+
+MACRO_DELAY = "DELAY"  # DELAY:<ms> (only valid inside a macro)
+
+_STEP_COMMANDS = {
+    CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP, CMD_MOUSE_MOVE, CMD_MOUSE_CLICK, CMD_SCROLL, MACRO_DELAY,
+}
+
+
+def macros_path():
+    """Macro file: $MACROS_FILE, else ~/.keyboardmouse_macros.json."""
+    return os.environ.get("MACROS_FILE") or os.path.join(os.path.expanduser("~"), ".keyboardmouse_macros.json")
+
+
+def _parse_step(line: str):
+    """Parse one macro step into (cmd, args); raise ValueError if it is not usable."""
+    parsed = parse_command(line)
+    if not parsed:
+        raise ValueError("empty step")
+    cmd, args = parsed
+    cmd = cmd.upper()
+    if cmd not in _STEP_COMMANDS:
+        raise ValueError(f"unsupported command {cmd!r}")
+    if cmd == MACRO_DELAY:
+        if not args or int(args[0].strip()) < 0:
+            raise ValueError("DELAY needs a non-negative number of milliseconds")
+    elif cmd == CMD_MOUSE_MOVE:
+        if not args or "," not in args[0]:
+            raise ValueError("MOVE needs dx,dy")
+        dx, dy = args[0].split(",", 1)
+        int(dx.strip()), int(dy.strip())
+    elif cmd == CMD_SCROLL:
+        if not args:
+            raise ValueError("SCROLL needs dy")
+        int(args[0].strip())
+    elif cmd != CMD_MOUSE_CLICK and not args:
+        raise ValueError(f"{cmd} needs a key name")
+    return cmd, [a.strip() for a in args]
+
+
+def load_macros(path=None) -> dict[str, list[tuple[str, list[str]]]]:
+    """Load and validate macros. Returns {name: [(cmd, args), ...]}; bad macros are skipped."""
+    path = path or macros_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError) as e:
+        log.error("Cannot read macros from %s: %s", path, e)
+        return {}
+    if not isinstance(raw, dict):
+        log.error("Macros file %s must be a JSON object of name -> list of steps", path)
+        return {}
+    macros = {}
+    for name, steps in raw.items():
+        if not isinstance(steps, list):
+            log.warning("Macro %r skipped: steps must be a list", name)
+            continue
+        try:
+            macros[name] = [_parse_step(str(s)) for s in steps]
+        except ValueError as e:
+            log.warning("Macro %r skipped: %s", name, e)
+    log.info("Loaded %d macro(s) from %s", len(macros), path)
+    return macros
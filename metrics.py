@@ -0,0 +1,197 @@
+"""
+Live metrics for the user server, published as Prometheus text on localhost.
+
+  METRICS_PORT=9464 ./run_server.sh
+  curl -s http://127.0.0.1:9464/metrics
+
+Counters, gauges and histograms are module-level objects (like prometheus_client, which
+is not required): create them once with counter()/gauge()/histogram() and update them
+from the hot path. Updates take one short lock; rendering happens only when scraped.
+"""
+
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+_REGISTRY = []
+
+# Seconds; covers an in-process call (~10 us) up to a slow subprocess spawn
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _label_str(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> value
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_label_str(self.labels, k)} {v:g}" for k, v in items]
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        super().__init__(name, help_text, labels)
+        self.fn = fn  # unlabelled gauge computed at scrape time
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        if self.fn is not None:
+            return self._header() + [f"{self.name} {self.fn():g}"]
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            h = self._values.get(labels)
+            if h is None:
+                h = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][bisect.bisect_left(self.buckets, value)] += 1
+            h[1] += value
+            h[2] += 1
+
+    def snapshot(self, *labels):
+        """(cumulative bucket counts, sum, count) for one label set."""
+        with self._lock:
+            h = self._values.get(labels)
+            if h is None:
+                return [0] * (len(self.buckets) + 1), 0.0, 0
+            counts, total, count = list(h[0]), h[1], h[2]
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def label_sets(self):
+        with self._lock:
+            return sorted(self._values)
+
+    def quantile(self, q, *labels):
+        """Upper bound of the bucket holding quantile q (inf past the last bucket, 0 if empty)."""
+        cumulative, _, count = self.snapshot(*labels)
+        if not count:
+            return 0.0
+        rank = q * count
+        for bound, c in zip(self.buckets + (float("inf"),), cumulative):
+            if c >= rank:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            keys = sorted(self._values)
+        for key in keys:
+            cumulative, total, count = self.snapshot(*key)
+            for bound, c in zip(list(self.buckets) + ["+Inf"], cumulative):
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_label_str(self.labels + ('le',), key + (le,))} {c}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {total:g}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {count}")
+        return lines
+
+
+def counter(name, help_text, labels=()) -> Counter:
+    m = Counter(name, help_text, labels)
+    _REGISTRY.append(m)
+    return m
+
+
+def gauge(name, help_text, labels=(), fn=None) -> Gauge:
+    m = Gauge(name, help_text, labels, fn)
+    _REGISTRY.append(m)
+    return m
+
+
+def histogram(name, help_text, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    m = Histogram(name, help_text, labels, buckets)
+    _REGISTRY.append(m)
+    return m
+
+
+def histograms() -> list:
+    """Registered histograms, for summaries outside the Prometheus format."""
+    return [m for m in _REGISTRY if isinstance(m, Histogram)]
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text exposition format."""
+    lines = []
+    for m in _REGISTRY:
+        lines += m.render()
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass  # scrapes every few seconds would flood the server log
+
+
+def start_http_server(port: int, host: str = "127.0.0.1"):
+    """Serve /metrics from a daemon thread. Localhost only by default."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.info("Metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
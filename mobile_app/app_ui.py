@@ -1,33 +1,143 @@
 # Full UI: load this after the app window is up to avoid "Loading..." crash.
-from protocol import encode_command, CMD_KEY, CMD_MOUSE_CLICK, CMD_SCROLL
+import json
+import math
+import os
+import threading
+import time
+
+from protocol import (
+    encode_command, CMD_KEY, CMD_KEY_DOWN, CMD_KEY_UP, CMD_MOUSE_CLICK, CMD_SCROLL,
+    CMD_MOUSE_MOVE_ABS, CMD_GESTURE, MSG_GEOMETRY, parse_geometry,
+    MSG_CLIP_OK, MSG_CLIP_ERROR, MSG_PONG, encode_clip,
+)
+from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.textinput import TextInput
 from kivy.properties import StringProperty, BooleanProperty, ObjectProperty
 from kivy.graphics import Color, Rectangle
 
-from bt_client import get_bt
+# bt_client (and jnius behind it) is imported on the worker threads, off the startup path
+
+
+def _last_device_path():
+    from kivy.app import App
+    app = App.get_running_app()
+    return os.path.join(app.user_data_dir if app else ".", "last_device.json")
+
+
+def _load_last_device() -> dict:
+    try:
+        with open(_last_device_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_last_device(device: dict) -> None:
+    try:
+        with open(_last_device_path(), "w", encoding="utf-8") as f:
+            json.dump(device, f)
+    except OSError:
+        pass
+
+
+# Gesture thresholds, in pixels of the pad
+SCROLL_STEP = 24   # two-finger travel per wheel notch
+PINCH_STEP = 60    # change in finger spread per zoom step
+SWIPE_MIN = 80     # three-finger travel for a swipe
+TAP_MAX_S = 0.3    # two-finger tap (right click) must be shorter than this
 
 
 class TouchPad(BoxLayout):
+    """
+    One finger: drag = MOVE, tap = left click (or absolute MOVE_ABS in tablet mode).
+    Two fingers: scroll or pinch, tap = right click. Three fingers: swipe.
+    Gestures are recognised here and sent as one GESTURE line each, not as MOVE streams.
+    """
+
     last_touch_pos = ObjectProperty(None, allownone=True)
     has_moved = BooleanProperty(False)
+    # Tablet mode: the pad maps onto the whole screen (monitor None) or one monitor
+    tablet_mode = BooleanProperty(False)
+    tablet_monitor = ObjectProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._touches = {}    # touch uid -> current position
+        self._fingers = 0     # most fingers down since the first one landed
+        self._gesture = None  # "scroll" or "pinch" once a two-finger move is recognised
+        self._t0 = 0.0
+
+    def _send(self, cmd, arg):
+        send = getattr(self.parent, "send", None)
+        if send:
+            send(encode_command(cmd, arg).strip())
+
+    def _send_abs(self, touch):
+        nx = min(max((touch.x - self.x) / max(self.width, 1), 0.0), 1.0)
+        ny = min(max(1.0 - (touch.y - self.y) / max(self.height, 1), 0.0), 1.0)  # screen y grows down
+        arg = f"{nx:.4f},{ny:.4f}"
+        if self.tablet_monitor is not None:
+            arg += f",{self.tablet_monitor}"
+        self.parent.send(encode_command(CMD_MOUSE_MOVE_ABS, arg).strip())
+
+    def _centroid(self):
+        n = len(self._touches)
+        return (sum(x for x, _ in self._touches.values()) / n, sum(y for _, y in self._touches.values()) / n)
+
+    def _spread(self):
+        (x1, y1), (x2, y2) = list(self._touches.values())[:2]
+        return math.hypot(x2 - x1, y2 - y1)
+
+    def _anchor(self):
+        """Start measuring a multi-finger gesture from the current finger positions."""
+        self._c0 = self._c = self._centroid()
+        self._s0 = self._spread()
+        self._steps_sent = 0
 
     def on_touch_down(self, touch):
         if not self.collide_point(*touch.pos):
             return False
         touch.grab(self)
-        self.last_touch_pos = (touch.x, touch.y)
-        self.has_moved = False
+        self._touches[touch.uid] = touch.pos
+        if len(self._touches) == 1:
+            self._fingers = 1
+            self._gesture = None
+            self._t0 = time.monotonic()
+            self.last_touch_pos = (touch.x, touch.y)
+            self.has_moved = False
+            if self.tablet_mode and getattr(self.parent, "send", None):
+                self._send_abs(touch)
+        else:
+            self._fingers = max(self._fingers, len(self._touches))
+            self.has_moved = True  # no left click when the fingers lift
+            self._anchor()
         return True
 
     def on_touch_move(self, touch):
         if touch.grab_current != self:
             return False
-        bt = get_bt()
-        if not bt or not hasattr(self.parent, "send") or not self.parent.send:
+        self._touches[touch.uid] = touch.pos
+        if not getattr(self.parent, "send", None):
+            return True
+        if self._fingers == 2 and len(self._touches) == 2:
+            self._two_finger_move()
+            return True
+        if self._fingers >= 3:
+            if len(self._touches) == self._fingers:
+                self._c = self._centroid()  # swipe is decided when the fingers lift
+            return True
+        if self._fingers != 1:
+            return True  # one finger left over from a gesture: ignore it
+        if self.tablet_mode:
+            ox, oy = self.last_touch_pos
+            if abs(touch.x - ox) + abs(touch.y - oy) > 10:
+                self.has_moved = True  # a drag, not a tap
+            self._send_abs(touch)
             return True
         ox, oy = self.last_touch_pos
         dx = int(touch.x - ox)
@@ -38,14 +148,51 @@ class TouchPad(BoxLayout):
             self.parent.send(encode_command("MOVE", f"{dx},{dy}").strip())
         return True
 
+    def _two_finger_move(self):
+        dy = self._centroid()[1] - self._c0[1]
+        dspread = self._spread() - self._s0
+        if self._gesture is None:
+            if abs(dspread) >= PINCH_STEP / 2:
+                self._gesture = "pinch"
+            elif abs(dy) >= SCROLL_STEP / 2:
+                self._gesture = "scroll"
+            else:
+                return
+        if self._gesture == "scroll":
+            # Content follows the fingers (fingers up = scroll down), like the phone itself
+            steps = int(dy / SCROLL_STEP)
+            if steps != self._steps_sent:
+                self._send(CMD_GESTURE, f"scroll:{self._steps_sent - steps}")
+                self._steps_sent = steps
+        else:
+            steps = int(dspread / PINCH_STEP)
+            if steps != self._steps_sent:
+                delta = steps - self._steps_sent
+                self._send(CMD_GESTURE, f"pinch_out:{delta}" if delta > 0 else f"pinch_in:{-delta}")
+                self._steps_sent = steps
+
     def on_touch_up(self, touch):
         if touch.grab_current != self:
             return False
         touch.ungrab(self)
-        if not self.has_moved:
-            bt = get_bt()
-            if bt and hasattr(self.parent, "send") and self.parent.send:
-                self.parent.send(encode_command("CLICK", "left").strip())
+        self._touches.pop(touch.uid, None)
+        if self._touches:
+            return True  # gesture ends when the last finger lifts
+        if self._fingers == 1:
+            if not self.has_moved:
+                self._send(CMD_MOUSE_CLICK, "left")
+        elif self._fingers == 2:
+            if self._gesture is None and time.monotonic() - self._t0 < TAP_MAX_S:
+                self._send(CMD_GESTURE, "right_click")
+        else:
+            dx, dy = self._c[0] - self._c0[0], self._c[1] - self._c0[1]
+            if max(abs(dx), abs(dy)) >= SWIPE_MIN:
+                if abs(dx) > abs(dy):
+                    name = "swipe_right" if dx > 0 else "swipe_left"
+                else:
+                    name = "swipe_up" if dy > 0 else "swipe_down"  # Kivy y grows up
+                self._send(CMD_GESTURE, name)
+        self._fingers = 0
         return True
 
 
@@ -57,11 +204,19 @@ class ControlScreen(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(orientation="vertical", **kwargs)
         self.bt = None
+        self.geometry = None  # (width, height, monitors) from the laptop's GEOMETRY
+        self._busy = False  # a discovery or connect is running on a worker thread
+        self._clip_lines = []  # clipboard transfer still to send, one line per frame
 
         self.add_widget(Label(size_hint_y=None, height=40, text="Keyboard & Mouse Remote"))
         self.status_label = Label(size_hint_y=None, height=30, text=self.status)
         self.add_widget(self.status_label)
         self.bind(status=self._update_status_label)
+        # Latency HUD: PING once a second while connected
+        self.rtt = None
+        self.hud = Label(size_hint_y=None, height=18, font_size="11sp", color=(0.7, 0.7, 0.7, 1), text="")
+        self.add_widget(self.hud)
+        Clock.schedule_interval(self._ping, 1.0)
 
         conn_layout = BoxLayout(size_hint_y=None, height=80)
         self.device_spinner = ScrollView(size_hint_x=0.6)
@@ -74,8 +229,13 @@ class ControlScreen(BoxLayout):
         connect_btn = Button(text="Connect", size_hint_x=0.2, on_press=self.do_connect)
         conn_layout.add_widget(connect_btn)
         self.add_widget(conn_layout)
+        self.host_input = TextInput(
+            size_hint_y=None, height=40, multiline=False,
+            hint_text="Wi-Fi: <token>@<laptop IP> (optional, needs laptop_server.py --net)",
+        )
+        self.add_widget(self.host_input)
 
-        self.add_widget(Label(size_hint_y=None, height=25, text="Touch pad (drag = move, tap = click)"))
+        self.add_widget(Label(size_hint_y=None, height=25, text="Touch pad (drag = move, tap = click, two fingers = scroll / right click)"))
         self.touch_pad = TouchPad(size_hint_y=0.4)
         self.touch_pad.canvas.before.add(Color(0.2, 0.25, 0.35, 1))
         self.touch_pad.canvas.before.add(Rectangle(pos=self.touch_pad.pos, size=self.touch_pad.size))
@@ -83,19 +243,34 @@ class ControlScreen(BoxLayout):
         self.add_widget(self.touch_pad)
 
         keys_layout = GridLayout(cols=4, size_hint_y=None, height=120, spacing=4, padding=4)
+        # Repeating keys are held (KEY_DOWN ... KEY_UP); the laptop does the auto-repeat
+        repeating = {"backspace", "up", "down", "left", "right"}
         for label, key in [
             ("Backspace", "backspace"), ("Enter", "enter"), ("Tab", "tab"), ("Esc", "escape"),
             ("Up", "up"), ("Down", "down"), ("Left", "left"), ("Right", "right"),
         ]:
-            btn = Button(text=label, on_press=lambda b, k=key: self.send_key(k))
+            if key in repeating:
+                btn = Button(
+                    text=label,
+                    on_press=lambda b, k=key: self.send_key_down(k),
+                    on_release=lambda b, k=key: self.send_key_up(k),
+                )
+            else:
+                btn = Button(text=label, on_press=lambda b, k=key: self.send_key(k))
             keys_layout.add_widget(btn)
         self.add_widget(keys_layout)
 
         scroll_layout = BoxLayout(size_hint_y=None, height=50)
         scroll_layout.add_widget(Button(text="Scroll Up", on_press=lambda _: self.send_scroll(2)))
         scroll_layout.add_widget(Button(text="Scroll Down", on_press=lambda _: self.send_scroll(-2)))
+        self.tablet_btn = Button(text="Tablet: off", on_press=self.cycle_tablet)
+        scroll_layout.add_widget(self.tablet_btn)
+        scroll_layout.add_widget(Button(text="Paste on PC", on_press=self.send_clipboard))
         self.add_widget(scroll_layout)
 
+        # Reconnect to the last laptop as soon as the screen is up
+        Clock.schedule_once(self._auto_connect)
+
     def _update_status_label(self, *args):
         self.status_label.text = self.status
 
@@ -106,52 +281,216 @@ class ControlScreen(BoxLayout):
                 c.size = self.touch_pad.size
                 break
 
+    def _in_background(self, work, done):
+        """Run work() on a worker thread (Bluetooth calls block for seconds) and hand
+        done(result, error) back to the Kivy thread."""
+        def run():
+            result, error = None, None
+            try:
+                result = work()
+            except Exception as e:
+                error = e
+            finally:
+                from bt_client import detach_thread
+                detach_thread()
+            Clock.schedule_once(lambda dt: done(result, error))
+        threading.Thread(target=run, daemon=True).start()
+
     def refresh_devices(self, *args):
-        self.bt = get_bt()
-        if not self.bt:
-            self.status = "Bluetooth not available"
+        if self._busy:
+            return
+        self._busy = True
+        self.status = "Searching..."
+
+        def work():
+            from bt_client import get_bt
+            bt = get_bt()
+            return bt, (bt["list_paired"]() if bt else [])
+
+        self._in_background(work, self._show_devices)
+
+    def _show_devices(self, result, error):
+        self._busy = False
+        if error is not None:
+            self.status = str(error)
+            return
+        # Only lists devices: self.bt stays the client of the live connection (maybe Wi-Fi)
+        bt, devices = result
+        if not bt:
+            if not self.connected:
+                self.status = "Bluetooth not available"
             return
         self.device_list.clear_widgets()
-        try:
-            devices = self.bt["list_paired"]()
-            for d in devices:
-                btn = Button(
-                    text=f"{d['name']}\n{d['address']}",
-                    size_hint_y=None, height=60,
-                    on_press=lambda b, addr=d["address"]: self._select_device(addr),
-                )
-                self.device_list.add_widget(btn)
-            if not devices:
-                self.device_list.add_widget(Label(text="No paired devices. Pair laptop first.", size_hint_y=None, height=40))
-        except Exception as e:
-            self.status = str(e)
+        for d in devices:
+            btn = Button(
+                text=f"{d['name']}\n{d['address']}",
+                size_hint_y=None, height=60,
+                on_press=lambda b, addr=d["address"]: self._select_device(addr),
+            )
+            self.device_list.add_widget(btn)
+        if not devices:
+            self.device_list.add_widget(Label(text="No paired devices. Pair laptop first.", size_hint_y=None, height=40))
+        if not self.connected:
+            self.status = "Not connected"
 
     def _select_device(self, address: str):
         self._selected_address = address
         self.status = "Selected: " + address
 
     def do_connect(self, *args):
-        self.bt = get_bt()
-        if not self.bt:
-            self.status = "Bluetooth not available"
+        if self._busy:
             return
-        addr = getattr(self, "_selected_address", None)
+        host = self.host_input.text.strip()
+        addr = host or getattr(self, "_selected_address", None)
         if not addr:
             self.status = "Select a device first (tap one above)"
             return
-        try:
-            self.bt["connect"](addr)
-            self.send = self.bt["send"]
-            self.connected = True
-            self.status = "Connected to " + addr
-        except Exception as e:
-            self.status = "Connect failed: " + str(e)
+        self._busy = True
+        self.status = "Connecting to " + addr + "..."
+        # Touches and keys during the reconnect are dropped, not sent to a closing client
+        old = self.bt if self.connected else None
+        self.send = None
+        self.connected = False
+
+        def work():
+            from bt_client import get_bt, get_net_client
+            bt = get_net_client() if host else get_bt()
+            if not bt:
+                raise RuntimeError("Bluetooth not available")
+            if old:
+                old["disconnect"]()
+            bt["connect"](addr, on_message=self._on_message)
+            return bt
+
+        self._in_background(work, lambda bt, error: self._connected(bt, error, addr, host))
+
+    def _connected(self, bt, error, addr, host):
+        self._busy = False
+        if error is not None:
+            self.status = "Connect failed: " + str(error)
+            self.send = None
             self.connected = False
+            return
+        from bt_client import RttTracker
+        self.bt = bt
+        self.send = bt["send"]
+        self.rtt = RttTracker()
+        self.connected = True
+        self.status = "Connected to " + addr
+        _save_last_device({"address": "" if host else addr, "host": host})
+
+    def _auto_connect(self, dt):
+        last = _load_last_device()
+        if last.get("host"):
+            self.host_input.text = last["host"]
+        elif last.get("address"):
+            self._selected_address = last["address"]
+        else:
+            return
+        self.do_connect()
 
     def send_key(self, key: str):
         if self.send:
             self.send(encode_command(CMD_KEY, key).strip())
 
+    def send_key_down(self, key: str):
+        if self.send:
+            self.send(encode_command(CMD_KEY_DOWN, key).strip())
+
+    def send_key_up(self, key: str):
+        if self.send:
+            self.send(encode_command(CMD_KEY_UP, key).strip())
+
     def send_scroll(self, dy: int):
         if self.send:
             self.send(encode_command(CMD_SCROLL, str(dy)).strip())
+
+    def send_clipboard(self, *args):
+        """Push the phone clipboard to the laptop and paste it there."""
+        if not self.send or self._clip_lines:
+            return
+        from kivy.core.clipboard import Clipboard
+        text = Clipboard.paste() or ""
+        if not text:
+            self.status = "Clipboard is empty"
+            return
+        self._clip_lines = encode_clip(text, paste=True)
+        self.status = f"Sending {len(text)} characters..."
+        # One chunk per frame: touch-pad and key lines go out between chunks
+        Clock.schedule_interval(self._send_clip_line, 0)
+
+    def _send_clip_line(self, dt):
+        if not self._clip_lines or not self.send:
+            self._clip_lines = []
+            return False
+        try:
+            self.send(self._clip_lines.pop(0))
+        except Exception as e:
+            self._clip_lines = []
+            self.status = "Clipboard send failed: " + str(e)
+            return False
+        return bool(self._clip_lines)
+
+    def cycle_tablet(self, *args):
+        """Off -> all screens -> monitor 1..n -> off."""
+        pad = self.touch_pad
+        monitors = len(self.geometry[2]) if self.geometry else 0
+        if not pad.tablet_mode:
+            pad.tablet_mode, pad.tablet_monitor = True, None
+        elif pad.tablet_monitor is None and monitors > 1:
+            pad.tablet_monitor = 0
+        elif pad.tablet_monitor is not None and pad.tablet_monitor + 1 < monitors:
+            pad.tablet_monitor += 1
+        else:
+            pad.tablet_mode, pad.tablet_monitor = False, None
+        self.tablet_btn.text = self._tablet_text()
+
+    def _tablet_text(self):
+        pad = self.touch_pad
+        if not pad.tablet_mode:
+            return "Tablet: off"
+        if pad.tablet_monitor is None:
+            return "Tablet: all screens"
+        return f"Tablet: monitor {pad.tablet_monitor + 1}"
+
+    def _on_message(self, line: str):
+        # Called from the client's reader thread; touch widgets only on the Kivy thread
+        if line.startswith(MSG_PONG + ":"):
+            if self.rtt is not None:
+                self.rtt.on_pong(line[len(MSG_PONG) + 1:])  # timed here, not a frame later
+            return
+        Clock.schedule_once(lambda dt: self._handle_message(line))
+
+    def _ping(self, dt):
+        if not self.connected or not self.send or self.rtt is None:
+            self.hud.text = ""
+            return
+        try:
+            self.send(self.rtt.ping_line())
+        except Exception:
+            return
+        s = self.rtt.summary()
+        if s:
+            self.hud.text = (
+                f"RTT {s['p50']:.0f} ms (p95 {s['p95']:.0f})  laptop {s['laptop_p50']:.1f} ms"
+                f"  radio {max(s['p50'] - s['laptop_p50'], 0):.0f} ms"
+                + (f"  lost {s['lost']}" if s["lost"] else "")
+            )
+
+    def _handle_message(self, line: str):
+        cmd, _, arg = line.partition(":")
+        if cmd == MSG_GEOMETRY:
+            geometry = parse_geometry(arg)
+            if geometry is None:
+                return
+            self.geometry = geometry
+            width, height, monitors = geometry
+            pad = self.touch_pad
+            if pad.tablet_monitor is not None and pad.tablet_monitor >= len(monitors):
+                pad.tablet_monitor = None
+                self.tablet_btn.text = self._tablet_text()
+            self.status = f"Connected, screen {width}x{height}, {len(monitors)} monitor(s)"
+        elif cmd == MSG_CLIP_OK:
+            self.status = f"Pasted on PC ({arg} bytes)"
+        elif cmd == MSG_CLIP_ERROR:
+            self.status = "Clipboard: " + arg
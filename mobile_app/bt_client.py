@@ -3,13 +3,97 @@ Bluetooth client: connects to the laptop server and sends keyboard/mouse command
 On Android uses Java Bluetooth API via jnius; on desktop uses PyBluez for testing.
 """
 
-from protocol import SPP_UUID
+import collections
+import os
+import socket
+import threading
+import time
+
+from protocol import SPP_UUID, NET_PORT, RELAY_TCP_PORT, NET_MOTION_SYNC, CMD_MOUSE_MOVE, CMD_HELLO, encode_motion
+from protocol import CMD_PING, CMD_AUTH, CMD_LANE, POINTER_UUID, LANE_POINTER, LANE_KEYS, pointer_lane
+
+
+def _lane_lines(session, token, lane):
+    """First lines of one of a client's two streams: HELLO (if any), then LANE."""
+    lines = [f"{CMD_HELLO}:{session}"] if session else []
+    return lines + [f"{CMD_LANE}:{token}:{lane}"]
+
+
+def _close(sock) -> None:
+    """Shut down, then close. A reader thread blocked in recv() keeps the socket open, so
+    close() alone would send nothing and the laptop would never see the disconnect."""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except Exception:
+        pass
+    try:
+        sock.close()
+    except Exception:
+        pass
+
+
+def _new_lane_token() -> str:
+    """Ties a client's pointer stream to its key stream on the laptop."""
+    return os.urandom(4).hex()
 
 def _android_send_line(stream, line: str) -> None:
     data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
     stream.write(bytes(data))
     stream.flush()
 
+
+def detach_thread() -> None:
+    """Release this thread's JVM attachment (Android); call before a worker thread ends."""
+    try:
+        from jnius import detach
+    except ImportError:
+        return
+    detach()
+
+
+def _android_read_lines(stream, on_message) -> None:
+    """Deliver lines from the laptop (e.g. GEOMETRY) to on_message, from a daemon thread."""
+    from jnius import autoclass
+    BufferedReader = autoclass("java.io.BufferedReader")
+    InputStreamReader = autoclass("java.io.InputStreamReader")
+    reader = BufferedReader(InputStreamReader(stream, "UTF-8"))
+
+    def run():
+        try:
+            while True:
+                line = reader.readLine()
+                if line is None:
+                    break
+                if line.strip():
+                    on_message(line.strip())
+        except Exception:
+            pass  # socket closed by disconnect()
+        finally:
+            detach_thread()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _socket_read_lines(sock, on_message) -> None:
+    """Same as _android_read_lines for a Python socket."""
+    def run():
+        buffer = b""
+        try:
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    line = line.decode("utf-8", errors="replace").strip()
+                    if line:
+                        on_message(line)
+        except OSError:
+            pass  # socket closed by disconnect()
+
+    threading.Thread(target=run, daemon=True).start()
+
 def get_android_client():
     """Return (connect_func, send_func) that use Android Bluetooth, or None if not on Android."""
     try:
@@ -20,12 +104,15 @@ def get_android_client():
         UUID = autoclass("java.util.UUID")
         # SPP UUID
         spp_uuid = UUID.fromString(SPP_UUID)
+        pointer_uuid = UUID.fromString(POINTER_UUID)
 
         _socket = None
         _output_stream = None
+        _pointer_socket = None  # second stream, if the laptop relay runs with --pointer-lane
+        _pointer_stream = None
 
-        def connect(device_address: str):
-            nonlocal _socket, _output_stream
+        def connect(device_address: str, on_message=None, session=None):
+            nonlocal _socket, _output_stream, _pointer_socket, _pointer_stream
             adapter = BluetoothAdapter.getDefaultAdapter()
             if not adapter.isEnabled():
                 raise RuntimeError("Bluetooth is disabled")
@@ -33,14 +120,41 @@ def get_android_client():
             _socket = device.createRfcommSocketToServiceRecord(spp_uuid)
             _socket.connect()
             _output_stream = _socket.getOutputStream()
+            if on_message is not None:
+                _android_read_lines(_socket.getInputStream(), on_message)
+            token = _new_lane_token()
+            # HELLO: which desktop session on a shared laptop
+            for line in _lane_lines(session, token, LANE_KEYS):
+                _android_send_line(_output_stream, line)
+            try:
+                _pointer_socket = device.createRfcommSocketToServiceRecord(pointer_uuid)
+                _pointer_socket.connect()
+                _pointer_stream = _pointer_socket.getOutputStream()
+                for line in _lane_lines(session, token, LANE_POINTER):
+                    _android_send_line(_pointer_stream, line)
+            except Exception:
+                _close_pointer()  # no pointer lane: everything on one stream
+
+        def _close_pointer():
+            nonlocal _pointer_socket, _pointer_stream
+            if _pointer_socket:
+                try:
+                    _pointer_socket.close()
+                except Exception:
+                    pass
+            _pointer_socket, _pointer_stream = None, None
 
         def send(line: str):
             if _output_stream is None:
                 raise RuntimeError("Not connected")
-            _android_send_line(_output_stream, line)
+            if _pointer_stream is not None and pointer_lane(line):
+                _android_send_line(_pointer_stream, line)
+            else:
+                _android_send_line(_output_stream, line)
 
         def disconnect():
             nonlocal _socket, _output_stream
+            _close_pointer()
             if _socket:
                 try:
                     _socket.close()
@@ -71,29 +185,51 @@ def get_desktop_client():
         return None
 
     _sock = None
+    _pointer = None  # second stream, if the laptop relay runs with --pointer-lane
 
-    def connect(device_address: str):
-        nonlocal _sock
+    def _send_on(sock, line: str):
+        data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
+        sock.send(data)
+
+    def connect(device_address: str, on_message=None, session=None):
+        nonlocal _sock, _pointer
         services = bluetooth.find_service(address=device_address, uuid=SPP_UUID)
         if not services:
             raise RuntimeError("SPP service not found on device. Is the laptop server running?")
         port = services[0]["port"]
         _sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
         _sock.connect((device_address, port))
+        if on_message is not None:
+            _socket_read_lines(_sock, on_message)
+        token = _new_lane_token()
+        for line in _lane_lines(session, token, LANE_KEYS):
+            _send_on(_sock, line)
+        services = bluetooth.find_service(address=device_address, uuid=POINTER_UUID)
+        if services:
+            try:
+                _pointer = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+                _pointer.connect((device_address, services[0]["port"]))
+                for line in _lane_lines(session, token, LANE_POINTER):
+                    _send_on(_pointer, line)
+            except (OSError, bluetooth.BluetoothError):
+                _close_pointer()
+
+    def _close_pointer():
+        nonlocal _pointer
+        if _pointer:
+            _close(_pointer)
+            _pointer = None
 
     def send(line: str):
         if _sock is None:
             raise RuntimeError("Not connected")
-        data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
-        _sock.send(data)
+        _send_on(_pointer if _pointer is not None and pointer_lane(line) else _sock, line)
 
     def disconnect():
         nonlocal _sock
+        _close_pointer()
         if _sock:
-            try:
-                _sock.close()
-            except Exception:
-                pass
+            _close(_sock)
             _sock = None
 
     def list_paired():
@@ -106,6 +242,180 @@ def get_desktop_client():
     return {"connect": connect, "send": send, "disconnect": disconnect, "list_paired": list_paired}
 
 
+def get_tcp_client():
+    """Plain TCP line stream (laptop relay started with --transport=tcp): same bytes as RFCOMM,
+    for testing the app and the laptop pipeline without Bluetooth radios."""
+
+    _sock = None
+    _pointer = None  # second stream on port + 1, if the relay runs with --pointer-lane
+
+    def _open(host, port):
+        s = socket.create_connection((host, port), timeout=5)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.settimeout(None)
+        return s
+
+    def _send_on(sock, line: str):
+        data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
+        sock.sendall(data)
+
+    def connect(address: str, on_message=None, session=None):
+        nonlocal _sock, _pointer
+        host, _, port = address.strip().partition(":")
+        port = int(port or RELAY_TCP_PORT)
+        _sock = _open(host, port)
+        if on_message is not None:
+            _socket_read_lines(_sock, on_message)
+        token = _new_lane_token()
+        for line in _lane_lines(session, token, LANE_KEYS):
+            _send_on(_sock, line)
+        try:
+            _pointer = _open(host, port + 1)
+            for line in _lane_lines(session, token, LANE_POINTER):
+                _send_on(_pointer, line)
+        except OSError:
+            _close_pointer()  # no pointer lane: everything on one stream
+
+    def _close_pointer():
+        nonlocal _pointer
+        if _pointer:
+            _close(_pointer)
+            _pointer = None
+
+    def send(line: str):
+        if _sock is None:
+            raise RuntimeError("Not connected")
+        _send_on(_pointer if _pointer is not None and pointer_lane(line) else _sock, line)
+
+    def disconnect():
+        nonlocal _sock
+        _close_pointer()
+        if _sock:
+            _close(_sock)
+            _sock = None
+
+    def list_paired():
+        return []
+
+    return {"connect": connect, "send": send, "disconnect": disconnect, "list_paired": list_paired}
+
+
+def get_net_client():
+    """LAN transport (laptop runs laptop_server.py --net): keys/clicks over TCP, MOVE as
+    latest-wins UDP datagrams carrying running totals, so a lost datagram never loses motion.
+    The address is [<token>@]<host>[:<port>]; the token is the one the laptop prints."""
+
+    _tcp = None
+    _udp = None
+    _seq = 0
+    _synced = 0  # newest _seq already repeated on TCP
+    _x, _y = 0, 0
+    _token = None
+
+    def connect(address: str, on_message=None, session=None):
+        nonlocal _tcp, _udp, _seq, _synced, _x, _y, _token
+        token, _, address = address.strip().rpartition("@")
+        _token = token or None
+        host, _, port = address.partition(":")
+        port = int(port or NET_PORT)
+        _tcp = socket.create_connection((host, port), timeout=5)
+        _tcp.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _tcp.settimeout(None)
+        _udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _udp.connect((host, port))
+        _seq, _synced, _x, _y = 0, 0, 0, 0
+        if _token:
+            _tcp.sendall(f"{CMD_AUTH}:{_token}\n".encode("utf-8"))  # must be the first line
+        if on_message is not None:
+            _socket_read_lines(_tcp, on_message)
+        if session:
+            send(f"{CMD_HELLO}:{session}")
+
+    def send(line: str):
+        nonlocal _seq, _synced, _x, _y
+        if _tcp is None:
+            raise RuntimeError("Not connected")
+        line = line.strip()
+        if line.startswith(CMD_MOUSE_MOVE + ":"):
+            dx, dy = line.split(":", 1)[1].split(",", 1)
+            _x += int(dx)
+            _y += int(dy)
+            _seq += 1
+            try:
+                _udp.send(encode_motion(_seq, _x, _y, _token))
+            except OSError:
+                pass  # next datagram carries the totals anyway
+            return
+        if _synced != _seq:
+            # Pointer must be where the user left it before a key/click takes effect
+            line = f"{NET_MOTION_SYNC}:{encode_motion(_seq, _x, _y).decode('ascii')}\n{line}"
+            _synced = _seq
+        _tcp.sendall((line + "\n").encode("utf-8"))
+
+    def disconnect():
+        nonlocal _tcp, _udp
+        for s in (_tcp, _udp):
+            if s:
+                _close(s)
+        _tcp, _udp = None, None
+
+    def list_paired():
+        return []  # LAN hosts are typed in, not discovered
+
+    return {"connect": connect, "send": send, "disconnect": disconnect, "list_paired": list_paired}
+
+
+class RttTracker:
+    """
+    Rolling round-trip latency from PING/PONG. The laptop answers after injecting
+    everything sent before the PING and reports its own share, so
+    radio (phone <-> relay <-> user server) = rtt - laptop.
+    Feed PONG arguments to on_pong() from the reader thread, before any UI hop.
+    """
+
+    def __init__(self, window=100):
+        self.rtt = collections.deque(maxlen=window)     # ms
+        self.laptop = collections.deque(maxlen=window)  # ms
+        self.sent = 0
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def ping_line(self) -> str:
+        self.sent += 1
+        return f"{CMD_PING}:{self.sent}:{time.monotonic() * 1000:.1f}"
+
+    def on_pong(self, arg: str):
+        now = time.monotonic() * 1000
+        try:
+            _seq, ts, laptop_ms = arg.split(":")
+            rtt, laptop_ms = now - float(ts), float(laptop_ms)
+        except ValueError:
+            return
+        with self._lock:
+            self.rtt.append(rtt)
+            self.laptop.append(laptop_ms)
+            self.received += 1
+
+    @staticmethod
+    def _pct(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def summary(self):
+        """{"p50", "p95", "laptop_p50", "lost"} in ms over the window, or None before the first PONG."""
+        with self._lock:
+            if not self.rtt:
+                return None
+            rtt, laptop = list(self.rtt), list(self.laptop)
+            received = self.received
+        return {
+            "p50": self._pct(rtt, 0.5),
+            "p95": self._pct(rtt, 0.95),
+            "laptop_p50": self._pct(laptop, 0.5),
+            "lost": max(0, self.sent - received - 1),  # one may still be in flight
+        }
+
+
 _client_cache = None
 
 
@@ -11,7 +11,7 @@ orientation = portrait
 android.archs = arm64-v8a
 # Local recipe to patch pyjnius for Python 3 (long -> int)
 android.local_recipes = recipes
-android.permissions = BLUETOOTH,BLUETOOTH_ADMIN,BLUETOOTH_CONNECT
+android.permissions = BLUETOOTH,BLUETOOTH_ADMIN,BLUETOOTH_CONNECT,INTERNET
 # Target API 33 for "latest privacy protection" (34 can break p4a/NDK)
 android.api = 33
 android.minapi = 26
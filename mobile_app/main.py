@@ -60,7 +60,7 @@ class KeyboardMouseApp(App):
         return root
 
     def on_start(self):
-        Clock.schedule_once(_load_ui, 0.5)
+        Clock.schedule_once(_load_ui, 0)  # next frame: the window is up by then
         Clock.schedule_once(_delayed_permission, 1.5)
 
 
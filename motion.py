@@ -0,0 +1,182 @@
+"""
+Optional pointer smoothing between parsing and the input backend (SMOOTHING=1).
+
+Bluetooth delivers touch deltas in bursts, so even coalesced MOVEs reach the cursor as
+visible jumps. MotionSmoother works in position space: every burst adds to a target
+position, a One-Euro filter follows the target, and a clock thread emits the filtered
+motion at display rate. Across short gaps the target is extrapolated from the recent
+velocity; after the gap it falls back to the true position, so no motion is lost.
+
+Tuning (environment of the user server):
+  SMOOTH_RATE=60             emit rate in Hz
+  SMOOTH_MIN_CUTOFF=1.5      Hz; lower = smoother but laggier at slow speeds
+  SMOOTH_BETA=0.01           speed coefficient; higher = less lag on fast flicks
+  SMOOTH_EXTRAPOLATE_MS=40   how far to predict across a gap (0 = never)
+"""
+
+import math
+import os
+import threading
+import time
+
+
+def _alpha(cutoff: float, dt: float) -> float:
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One-Euro filter (Casiez et al.) for one coordinate."""
+
+    def __init__(self, min_cutoff=1.5, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = 0.0
+
+    def reset(self, x: float):
+        self.x = x
+        self.dx = 0.0
+
+    def __call__(self, x: float, dt: float) -> float:
+        if self.x is None:
+            self.x = x
+            return x
+        if dt <= 0:
+            return self.x
+        a_d = _alpha(self.d_cutoff, dt)
+        self.dx = a_d * ((x - self.x) / dt) + (1 - a_d) * self.dx
+        cutoff = self.min_cutoff + self.beta * abs(self.dx)
+        a = _alpha(cutoff, dt)
+        self.x = a * x + (1 - a) * self.x
+        return self.x
+
+
+class MotionSmoother:
+    """
+    Filters MOVE deltas and emits them on a steady clock.
+
+    push(dx, dy) takes one burst (already summed: all lines of a burst arrive at the same
+    instant, so per-line filtering would add nothing). settle() returns the motion not yet
+    emitted so the pipeline can inject it before a click or key lands. emit(dx, dy) is
+    called from the clock thread with integer deltas.
+    """
+
+    def __init__(self, emit, rate=60.0, min_cutoff=1.5, beta=0.01, extrapolate_ms=40.0):
+        self.emit = emit
+        self.period = 1.0 / rate
+        self.extrapolate = extrapolate_ms / 1000.0
+        self.fx = OneEuroFilter(min_cutoff, beta)
+        self.fy = OneEuroFilter(min_cutoff, beta)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self.tx = self.ty = 0.0      # target: sum of all input
+        self.ex = self.ey = 0        # emitted so far (integers)
+        self.vx = self.vy = 0.0      # input velocity, px/s
+        self.last_input = 0.0
+        self.last_tick = 0.0
+        self.ticks = 0
+
+    @classmethod
+    def from_env(cls, emit):
+        return cls(
+            emit,
+            rate=float(os.environ.get("SMOOTH_RATE", 60)),
+            min_cutoff=float(os.environ.get("SMOOTH_MIN_CUTOFF", 1.5)),
+            beta=float(os.environ.get("SMOOTH_BETA", 0.01)),
+            extrapolate_ms=float(os.environ.get("SMOOTH_EXTRAPOLATE_MS", 40)),
+        )
+
+    def configure(self, rate=None, min_cutoff=None, beta=None, extrapolate_ms=None):
+        """Change tuning while running (admin control socket); None keeps a value."""
+        with self._lock:
+            if rate is not None:
+                self.period = 1.0 / rate
+            if min_cutoff is not None:
+                self.fx.min_cutoff = self.fy.min_cutoff = min_cutoff
+            if beta is not None:
+                self.fx.beta = self.fy.beta = beta
+            if extrapolate_ms is not None:
+                self.extrapolate = extrapolate_ms / 1000.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+
+    def push(self, dx: int, dy: int, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            gap = now - self.last_input
+            if self.last_input and 0 < gap < 0.25:
+                # Velocity of this burst, lightly smoothed against the previous ones
+                self.vx = 0.5 * self.vx + 0.5 * dx / gap
+                self.vy = 0.5 * self.vy + 0.5 * dy / gap
+            else:
+                self.vx = self.vy = 0.0
+            if not self._active():
+                # Starting from rest: the filters begin at the emitted position
+                self.fx.reset(self.ex)
+                self.fy.reset(self.ey)
+                self.last_tick = now
+            self.tx += dx
+            self.ty += dy
+            self.last_input = now
+        self._wake.set()
+
+    def settle(self):
+        """Everything not yet emitted, as (dx, dy); the smoother is then at rest."""
+        with self._lock:
+            dx, dy = round(self.tx) - self.ex, round(self.ty) - self.ey
+            self.ex += dx
+            self.ey += dy
+            self.fx.reset(self.ex)
+            self.fy.reset(self.ey)
+            self.vx = self.vy = 0.0
+            self.last_input = 0.0
+        return dx, dy
+
+    def _active(self) -> bool:
+        return round(self.tx) != self.ex or round(self.ty) != self.ey
+
+    def tick(self, now: float):
+        """Advance the filter to `now`; returns the integer (dx, dy) to emit, maybe (0, 0)."""
+        with self._lock:
+            dt = now - self.last_tick
+            self.last_tick = now
+            gap = now - self.last_input
+            px, py = self.tx, self.ty
+            if gap < self.extrapolate:
+                px += self.vx * gap
+                py += self.vy * gap
+            fx = self.fx(px, dt)
+            fy = self.fy(py, dt)
+            if gap >= self.extrapolate and abs(fx - self.tx) < 1 and abs(fy - self.ty) < 1:
+                fx, fy = self.tx, self.ty  # converged: land exactly on the target
+            dx, dy = round(fx) - self.ex, round(fy) - self.ey
+            self.ex += dx
+            self.ey += dy
+            self.ticks += 1
+            return dx, dy
+
+    def _run(self):
+        while not self._stop:
+            with self._lock:
+                busy = self._active() or (time.monotonic() - self.last_input) < self.extrapolate
+            if not busy:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            now = time.monotonic()
+            dx, dy = self.tick(now)
+            if dx or dy:
+                self.emit(dx, dy)
+            # Sleep to the next tick on a fixed grid, so emission stays steady
+            time.sleep(max(0.0, self.period - (time.monotonic() - now)))
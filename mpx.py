@@ -0,0 +1,170 @@
+"""
+X multi-pointer (MPX): each connected phone gets its own cursor and keyboard focus (MPX=1).
+
+For every connection the user server creates an XInput2 master pointer/keyboard pair
+(`xinput create-master`) and opens its own X connection whose ClientPointer is that
+master (XISetClientPointer). The X server routes XTest input from a client through its
+ClientPointer's XTEST devices, so core XTest calls on that connection move only that
+phone's cursor and type into its keyboard focus. The pair is removed on disconnect.
+
+X11 only (Xorg, Xvfb); needs the xinput tool and libX11, libXi, libXtst (ctypes, no
+Python bindings).
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import subprocess
+
+log = logging.getLogger(__name__)
+
+# Protocol key names that are not X keysym names
+_MODIFIER_KEYSYMS = {"shift": "Shift_L", "ctrl": "Control_L", "alt": "Alt_L", "super": "Super_L"}
+
+_libs = None
+
+
+def _load():
+    """(libX11, libXi, libXtst) with prototypes set, loaded once. Raises OSError if missing."""
+    global _libs
+    if _libs is not None:
+        return _libs
+    paths = {name: ctypes.util.find_library(name) for name in ("X11", "Xi", "Xtst")}
+    missing = [name for name, path in paths.items() if not path]
+    if missing:
+        raise OSError("missing libraries: " + ", ".join("lib" + m for m in missing))
+    x11, xi, xtst = (ctypes.CDLL(paths[n]) for n in ("X11", "Xi", "Xtst"))
+    dpy, ulong, uint, c_int = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_uint, ctypes.c_int
+
+    x11.XOpenDisplay.argtypes, x11.XOpenDisplay.restype = [ctypes.c_char_p], dpy
+    x11.XCloseDisplay.argtypes = [dpy]
+    x11.XFlush.argtypes = [dpy]
+    x11.XDefaultScreen.argtypes, x11.XDefaultScreen.restype = [dpy], c_int
+    x11.XDisplayWidth.argtypes, x11.XDisplayWidth.restype = [dpy, c_int], c_int
+    x11.XDisplayHeight.argtypes, x11.XDisplayHeight.restype = [dpy, c_int], c_int
+    x11.XDefaultRootWindow.argtypes, x11.XDefaultRootWindow.restype = [dpy], ulong
+    x11.XQueryPointer.argtypes = [dpy, ulong] + [ctypes.c_void_p] * 7
+    x11.XStringToKeysym.argtypes, x11.XStringToKeysym.restype = [ctypes.c_char_p], ulong
+    x11.XKeysymToKeycode.argtypes, x11.XKeysymToKeycode.restype = [dpy, ulong], ctypes.c_ubyte
+    xi.XISetClientPointer.argtypes, xi.XISetClientPointer.restype = [dpy, ulong, c_int], c_int
+    xtst.XTestFakeRelativeMotionEvent.argtypes = [dpy, c_int, c_int, ulong]
+    xtst.XTestFakeMotionEvent.argtypes = [dpy, c_int, c_int, c_int, ulong]
+    xtst.XTestFakeButtonEvent.argtypes = [dpy, uint, c_int, ulong]
+    xtst.XTestFakeKeyEvent.argtypes = [dpy, uint, c_int, ulong]
+    _libs = (x11, xi, xtst)
+    return _libs
+
+
+def _env():
+    return {**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0")}
+
+
+def _xinput(*args) -> subprocess.CompletedProcess:
+    return subprocess.run(["xinput", *args], env=_env(), capture_output=True, timeout=5)
+
+
+def available() -> bool:
+    """True if masters can be created and driven here (X server with XInput2, xinput, libs)."""
+    try:
+        _load()
+        return _xinput("list", "--id-only", "Virtual core pointer").returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def masters(prefix: str = "kbm-") -> dict:
+    """Master pointers whose name starts with prefix: name -> device id."""
+    r = _xinput("list", "--short")
+    found = {}
+    for line in r.stdout.decode(errors="replace").splitlines():
+        name, _, rest = line.strip(" ⎡⎜⎣↳∼").partition("\tid=")
+        name = name.strip()
+        if name.startswith(prefix) and name.endswith(" pointer") and "master pointer" in rest:
+            found[name[: -len(" pointer")]] = int(rest.split("\t", 1)[0])
+    return found
+
+
+class MasterPair:
+    """An XInput2 master pointer + keyboard, created now and removed by close()."""
+
+    def __init__(self, name: str):
+        self.name = name
+        r = _xinput("create-master", name)
+        if r.returncode != 0:
+            raise OSError(f"xinput create-master failed: {r.stderr.decode(errors='replace').strip()}")
+        r = _xinput("list", "--id-only", f"{name} pointer")
+        try:
+            self.pointer_id = int(r.stdout.decode().strip())
+        except ValueError:
+            self.close()
+            raise OSError(f"master {name!r} not found after creating it")
+
+    def close(self):
+        try:
+            _xinput("remove-master", f"{self.name} pointer")
+        except (OSError, subprocess.TimeoutExpired) as e:
+            log.warning("Cannot remove master %s: %s", self.name, e)
+
+
+class XTestClient:
+    """An X connection whose ClientPointer is one master: its XTest input goes to that
+    master's cursor and keyboard focus. Not thread-safe; callers serialize."""
+
+    def __init__(self, pointer_id: int):
+        self.x11, xi, self.xtst = _load()
+        self.dpy = self.x11.XOpenDisplay(_env()["DISPLAY"].encode())
+        if not self.dpy:
+            raise OSError("cannot open display " + _env()["DISPLAY"])
+        if not xi.XISetClientPointer(self.dpy, 0, pointer_id):
+            self.close()
+            raise OSError("XISetClientPointer failed")
+        self.screen = self.x11.XDefaultScreen(self.dpy)
+        self._keycodes = {}
+
+    def close(self):
+        if self.dpy:
+            self.x11.XCloseDisplay(self.dpy)
+            self.dpy = None
+
+    def screen_size(self):
+        return self.x11.XDisplayWidth(self.dpy, self.screen), self.x11.XDisplayHeight(self.dpy, self.screen)
+
+    def pointer(self):
+        """(x, y) of this connection's master pointer (core XQueryPointer follows the ClientPointer)."""
+        root, child = ctypes.c_ulong(), ctypes.c_ulong()
+        x, y, wx, wy = (ctypes.c_int() for _ in range(4))
+        mask = ctypes.c_uint()
+        self.x11.XQueryPointer(
+            self.dpy, self.x11.XDefaultRootWindow(self.dpy), ctypes.byref(root), ctypes.byref(child),
+            ctypes.byref(x), ctypes.byref(y), ctypes.byref(wx), ctypes.byref(wy), ctypes.byref(mask),
+        )
+        return x.value, y.value
+
+    def move_rel(self, dx: int, dy: int):
+        self.xtst.XTestFakeRelativeMotionEvent(self.dpy, dx, dy, 0)
+
+    def move_to(self, x: int, y: int):
+        self.xtst.XTestFakeMotionEvent(self.dpy, self.screen, x, y, 0)
+
+    def button(self, number: int, press: bool):
+        self.xtst.XTestFakeButtonEvent(self.dpy, number, press, 0)
+
+    def keycode(self, name: str) -> int:
+        """Keycode for a key name as in laptop_server.XDOTOOL_KEYS or a single character; 0 if none."""
+        code = self._keycodes.get(name)
+        if code is None:
+            if len(name) == 1:
+                # Latin-1 keysyms equal the code point; others use the Unicode keysym range
+                keysym = ord(name) if ord(name) < 0x100 else 0x01000000 + ord(name)
+            else:
+                keysym = self.x11.XStringToKeysym(_MODIFIER_KEYSYMS.get(name, name).encode())
+            code = self.x11.XKeysymToKeycode(self.dpy, keysym) if keysym else 0
+            self._keycodes[name] = code
+        return code
+
+    def key(self, code: int, press: bool):
+        self.xtst.XTestFakeKeyEvent(self.dpy, code, press, 0)
+
+    def flush(self):
+        self.x11.XFlush(self.dpy)
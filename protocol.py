@@ -3,6 +3,11 @@ Shared protocol for keyboard/mouse control over Bluetooth.
 One command per line, UTF-8 encoded. Newline (\n) terminates each command.
 """
 
+import base64
+import hashlib
+import hmac
+import zlib
+
 # Standard SPP UUID - use this on both laptop server and Android client
 SPP_UUID = "00001101-0000-1000-8000-00805F9B34FB"
 
@@ -13,6 +18,78 @@ CMD_KEY_UP = "KEY_UP"
 CMD_MOUSE_MOVE = "MOVE"   # MOVE:dx,dy (relative, integers)
 CMD_MOUSE_CLICK = "CLICK" # CLICK:left|right|middle
 CMD_SCROLL = "SCROLL"     # SCROLL:dy (vertical, integer)
+CMD_MOUSE_MOVE_ABS = "MOVE_ABS"  # MOVE_ABS:x,y[,monitor] (absolute, 0..1 of screen or monitor)
+CMD_MACRO = "MACRO"       # MACRO:<name> (run a server-side macro, see macros.py)
+CMD_GESTURE = "GESTURE"   # GESTURE:<name>[:<arg>] (touch-pad gesture, see gestures.py)
+CMD_HELLO = "HELLO"       # HELLO:<session> (optional first line: which desktop session to control)
+# Clipboard push: CLIP_BEGIN:<bytes>:<crc32 hex>[:paste], CLIP_DATA:<offset>:<base64>..., CLIP_END
+CMD_CLIP_BEGIN = "CLIP_BEGIN"
+CMD_CLIP_DATA = "CLIP_DATA"
+CMD_CLIP_END = "CLIP_END"
+CMD_PING = "PING"         # PING:<seq>:<client ms> (latency probe)
+CMD_LANE = "LANE"         # LANE:<token>:pointer|keys (first line on each of a client's two streams)
+CMD_AUTH = "AUTH"         # AUTH:<token> (first line to a LAN relay with NET_TOKEN)
+
+# Messages (server -> client)
+MSG_GEOMETRY = "GEOMETRY" # GEOMETRY:<w>,<h>;<x>,<y>,<w>,<h>;... (screen size, then each monitor)
+MSG_CLIP_OK = "CLIP_OK"   # CLIP_OK:<bytes> (clipboard set)
+MSG_CLIP_ERROR = "CLIP_ERROR"  # CLIP_ERROR:<reason>
+MSG_PONG = "PONG"         # PONG:<seq>:<client ms>:<laptop ms> (PING echoed after injection)
+
+# LAN transport (optional, see laptop_server.py --net): keys/clicks over TCP and pointer
+# motion over UDP, both on NET_PORT.
+NET_PORT = 47800
+
+# Relay started with --transport=tcp: the same line stream as RFCOMM over plain TCP.
+RELAY_TCP_PORT = 47801
+
+# Optional second stream per client (relay started with --pointer-lane): pointer traffic on
+# its own RFCOMM channel (found by this UUID) or on RELAY_TCP_PORT + 1, so a burst of motion
+# queued in one stream never delays the next key. Clicks and gestures (right-click, pinch
+# zoom, and any gesture remapped by a macro) ride with the motion before them, since where
+# they land depends on where the pointer is.
+POINTER_UUID = "8f3a6c2e-1b4d-4e7a-9c5f-2d8e6b1a7c40"
+LANE_POINTER = "pointer"
+LANE_KEYS = "keys"
+
+def pointer_lane(line: str) -> bool:
+    """True if this line belongs on the pointer stream."""
+    cmd = line.split(":", 1)[0].strip().upper()
+    return cmd in (CMD_MOUSE_MOVE, CMD_MOUSE_MOVE_ABS, CMD_SCROLL, CMD_MOUSE_CLICK, CMD_GESTURE)
+
+# UDP motion datagram: "<seq>:<x>,<y>" where x,y are the client's running totals of MOVE
+# deltas since it connected. The server moves by the difference from the newest totals it
+# has applied and drops older datagrams (latest wins), so loss or reordering never loses motion.
+# Before a key/click the client repeats its newest totals on TCP as MOTION:<seq>:<x>,<y>,
+# so the click lands where the pointer was even if the last datagram is still in flight.
+NET_MOTION_SYNC = "MOTION"
+
+# A LAN relay with a token accepts only datagrams that end in ":<mac>", an HMAC of the rest
+# keyed with the token, so a spoofed source address alone cannot move the pointer.
+
+def motion_mac(token: str, body: bytes) -> bytes:
+    return hmac.new(token.encode("utf-8"), body, hashlib.sha256).hexdigest()[:16].encode("ascii")
+
+def encode_motion(seq: int, x: int, y: int, token: str = None) -> bytes:
+    """Encode one UDP motion datagram (signed when the relay has a token)."""
+    body = f"{seq}:{x},{y}".encode("ascii")
+    return body + b":" + motion_mac(token, body) if token else body
+
+def parse_motion(data: bytes, token: str = None) -> tuple[int, int, int] | None:
+    """Parse a UDP motion datagram into (seq, x, y) or None if invalid (or, with a token,
+    not signed with it)."""
+    data = data.strip()
+    if token:
+        body, _, mac = data.rpartition(b":")
+        if not hmac.compare_digest(mac, motion_mac(token, body)):
+            return None
+        data = body
+    try:
+        seq, xy = data.decode("ascii").split(":", 1)
+        x, y = xy.split(",", 1)
+        return int(seq), int(x), int(y)
+    except (UnicodeDecodeError, ValueError):
+        return None
 
 # Special key names (match pynput Key names where possible)
 SPECIAL_KEYS = {
@@ -27,6 +104,26 @@ def encode_command(cmd: str, *args: str) -> str:
     parts = [cmd] + list(args)
     return ":".join(parts) + "\n"
 
+# Raw bytes per CLIP_DATA line; small enough that a key or click sent between two chunks
+# is not held up noticeably
+CLIP_CHUNK = 1024
+
+def encode_clip(text: str, paste: bool = False) -> list[str]:
+    """Lines (without newlines) that push text to the laptop clipboard, in order."""
+    data = text.encode("utf-8")
+    begin = f"{CMD_CLIP_BEGIN}:{len(data)}:{zlib.crc32(data):08x}" + (":paste" if paste else "")
+    lines = [begin]
+    for offset in range(0, len(data), CLIP_CHUNK):
+        chunk = base64.b64encode(data[offset:offset + CLIP_CHUNK]).decode("ascii")
+        lines.append(f"{CMD_CLIP_DATA}:{offset}:{chunk}")
+    lines.append(CMD_CLIP_END)
+    return lines
+
+def encode_geometry(width: int, height: int, monitors) -> str:
+    """GEOMETRY message for a screen and its monitors [(x, y, w, h), ...]."""
+    parts = [f"{width},{height}"] + [f"{x},{y},{w},{h}" for x, y, w, h in monitors]
+    return encode_command(MSG_GEOMETRY, ";".join(parts))
+
 def parse_command(line: str) -> tuple[str, list[str]] | None:
     """Parse one line into (command, args) or None if invalid."""
     line = line.strip()
@@ -4,7 +4,11 @@
 cd "$(dirname "$0")"
 
 USER_PID=
+NET_PID=
 cleanup() {
+  if [ -n "$NET_PID" ]; then
+    kill "$NET_PID" 2>/dev/null
+  fi
   if [ -n "$USER_PID" ]; then
     kill "$USER_PID" 2>/dev/null
   fi
@@ -29,20 +33,30 @@ if command -v ydotoold >/dev/null 2>&1; then
   fi
 fi
 
-./venv/bin/python laptop_server.py --user &
+# The user server writes READY to this FIFO once its backend is warmed up and the socket
+# accepts connections, so there is no polling and no fixed sleep
+READY_FIFO="$(mktemp -u "${TMPDIR:-/tmp}/keyboardmouse-ready.XXXXXX")"
+mkfifo -m 600 "$READY_FIFO"
+KEYBOARDMOUSE_READY_FIFO="$READY_FIFO" ./venv/bin/python laptop_server.py --user &
 USER_PID=$!
 
-# Wait until the user server creates the socket (in home dir)
-SOCK="$HOME/.keyboardmouse.sock"
-for i in 1 2 3 4 5 6 7 8 9 10; do
-  [ -S "$SOCK" ] && break
-  sleep 0.5
-done
-if [ ! -S "$SOCK" ]; then
-  echo "User server did not create $SOCK in time."
+# A server that exits early never writes, so bound the wait
+READY=
+read -r -t 15 READY <> "$READY_FIFO"
+rm -f "$READY_FIFO"
+if [ "$READY" != "READY" ]; then
+  echo "User server did not become ready (see the messages above)."
   kill "$USER_PID" 2>/dev/null
   exit 1
 fi
 
-sudo ./venv/bin/python laptop_server.py --bt
+# Optional LAN transport (TCP keys + UDP motion), no sudo:  NET_BIND=0.0.0.0 NET=1 ./run_server.sh
+# (prints the token the app needs; NET_TOKEN=<token> to keep one)
+if [ -n "$NET" ]; then
+  ./venv/bin/python laptop_server.py --net &
+  NET_PID=$!
+fi
+
+# Optional second Bluetooth channel for pointer motion:  POINTER_LANE=1 ./run_server.sh
+sudo ./venv/bin/python laptop_server.py --bt ${POINTER_LANE:+--pointer-lane}
 cleanup
@@ -0,0 +1,179 @@
+"""
+Registry of user servers for the relay: one Unix socket per desktop session.
+
+A user server listens on ~/.keyboardmouse.sock, or on ~/.keyboardmouse-<name>.sock when
+started with KEYBOARDMOUSE_SESSION=<name> (e.g. one per display). The relay finds them by
+scanning home directories when a phone connects, so user servers can come and go without
+restarting it. Sessions are named "<user>" or "<user>:<name>".
+
+A phone connection is routed once, when it is accepted (forwarding afterwards is plain
+byte copying, so routing costs nothing per message):
+
+  1. HELLO:<session> as its first line ("alice:work", "alice", or just "work")
+  2. its device address in the routes file, ~/.keyboardmouse_routes.json of the user who
+     started the relay, or $RELAY_ROUTES:   {"AA:BB:CC:DD:EE:FF": "bob:1"}
+  3. the default session of that user, else that user's only session
+
+Only the relay user's sessions are open to every phone. HELLO may name another user's
+session only if the routes file maps that phone's address to a session of the same user,
+so a paired phone cannot type into someone else's desktop by asking for it.
+"""
+
+import json
+import logging
+import os
+import pwd
+import re
+import select
+import stat
+import time
+
+from protocol import CMD_HELLO
+
+log = logging.getLogger(__name__)
+
+SOCK_NAME = ".keyboardmouse"
+_SOCK_FILE = re.compile(r"^\.keyboardmouse(?:-([A-Za-z0-9_.-]+))?\.sock$")
+
+
+def session_name() -> str:
+    """This user server's session name from $KEYBOARDMOUSE_SESSION ("" = default)."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", os.environ.get("KEYBOARDMOUSE_SESSION", "").strip())
+
+
+def socket_path(uid=None, session=None) -> str:
+    """Unix socket of a user server: $KEYBOARDMOUSE_SOCK, else in the user's home directory."""
+    if os.environ.get("KEYBOARDMOUSE_SOCK"):
+        return os.environ["KEYBOARDMOUSE_SOCK"]
+    if uid is None:
+        uid = os.getuid()
+    if session is None:
+        session = session_name()
+    name = f"{SOCK_NAME}-{session}.sock" if session else f"{SOCK_NAME}.sock"
+    return os.path.join(pwd.getpwuid(int(uid)).pw_dir, name)
+
+
+class SessionRegistry:
+    """Finds user-server sockets and picks one for each new phone connection."""
+
+    def __init__(self, default_uid=None):
+        self.default_uid = int(os.getuid() if default_uid is None else default_uid)
+        self.default_user = pwd.getpwuid(self.default_uid).pw_name
+        home = pwd.getpwuid(self.default_uid).pw_dir
+        self.routes_path = os.environ.get("RELAY_ROUTES") or os.path.join(home, ".keyboardmouse_routes.json")
+
+    def _users(self):
+        if os.getuid() != 0:
+            return [pwd.getpwuid(os.getuid())]  # can only reach our own sockets anyway
+        return [p for p in pwd.getpwall() if p.pw_uid >= 1000 or p.pw_uid == self.default_uid]
+
+    def scan(self) -> dict:
+        """{session: socket path} for every user server currently listening."""
+        if os.environ.get("KEYBOARDMOUSE_SOCK"):
+            return {self.default_user: os.environ["KEYBOARDMOUSE_SOCK"]}
+        found = {}
+        for user in self._users():
+            try:
+                names = os.listdir(user.pw_dir)
+            except OSError:
+                continue
+            for name in names:
+                m = _SOCK_FILE.match(name)
+                if not m:
+                    continue
+                path = os.path.join(user.pw_dir, name)
+                try:
+                    if not stat.S_ISSOCK(os.stat(path).st_mode):
+                        continue
+                except OSError:
+                    continue
+                found[f"{user.pw_name}:{m.group(1)}" if m.group(1) else user.pw_name] = path
+        return found
+
+    def routes(self) -> dict:
+        """{device address: session} from the routes file (re-read per connection, so edits apply)."""
+        try:
+            with open(self.routes_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring routes file %s: %s", self.routes_path, e)
+            return {}
+        return {str(k).upper(): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def _match(self, sessions: dict, wanted: str):
+        """(session, path) for a session name, or (None, None)."""
+        if wanted in sessions:
+            return wanted, sessions[wanted]
+        # A bare name: one of the default user's sessions
+        own = f"{self.default_user}:{wanted}"
+        return (own, sessions[own]) if own in sessions else (None, None)
+
+    @staticmethod
+    def _user(session: str) -> str:
+        return session.split(":", 1)[0]
+
+    def resolve(self, address=None, hello=None):
+        """(session, socket path) for a new connection, or (None, None) if nothing fits."""
+        sessions = self.scan()
+        routed = self.routes().get(str(address or "").upper())
+        routed_session = None
+        if routed:
+            routed_session, path = self._match(sessions, routed)
+            if not path:
+                log.warning("Session %r (from routes file) has no user server running", routed)
+        if hello:
+            session, path = self._match(sessions, hello)
+            allowed = {self.default_user} | ({self._user(routed_session)} if routed_session else set())
+            if not path:
+                log.warning("Session %r (from HELLO) has no user server running", hello)
+            elif self._user(session) not in allowed:
+                log.warning("Session %r (from HELLO) belongs to another user and %s is not routed "
+                            "there in %s; ignoring it", hello, address, self.routes_path)
+            else:
+                return session, path
+        if routed_session:
+            return routed_session, sessions[routed_session]
+        if self.default_user in sessions:
+            return self.default_user, sessions[self.default_user]
+        own = [name for name in sessions if self._user(name) == self.default_user]
+        if len(own) == 1:
+            return own[0], sessions[own[0]]
+        return None, None
+
+
+def read_first_line(conn, cmd: str, timeout=0.2, data=b""):
+    """
+    Read an optional <cmd>:<value> first line from a new connection.
+    Returns (value or None, bytes already read that must still be handled).
+    Clients that do not send it cost one short wait, once per connection.
+    data: bytes already read from conn (they come first).
+
+    Waits with select() rather than a socket timeout: a PyBluez socket that times out
+    raises BluetoothError, not socket.timeout, which would look like a dead connection.
+    """
+    prefix = (cmd + ":").encode("ascii")
+    deadline = time.monotonic() + timeout
+    while True:
+        if len(data) < len(prefix):
+            if data and not prefix.startswith(data):
+                break  # ordinary commands
+        elif not data.startswith(prefix):
+            break
+        elif b"\n" in data:
+            line, rest = data.split(b"\n", 1)
+            return line[len(prefix):].decode("utf-8", errors="replace").strip(), rest
+        left = deadline - time.monotonic()
+        if left <= 0 or not select.select([conn], [], [], left)[0]:
+            break  # nothing more within the wait: not sent
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return None, data
+
+
+def read_hello(conn, timeout=0.2, data=b""):
+    """HELLO:<session> first line of a phone connection: (session or None, bytes to forward)."""
+    return read_first_line(conn, CMD_HELLO, timeout, data)
@@ -0,0 +1,72 @@
+"""First-line reads (HELLO, LANE, AUTH) must not drop clients that send nothing at first."""
+
+import socket
+import threading
+import time
+
+from sessions import read_first_line, read_hello
+
+
+class TimeoutRaisesOSError:
+    """Stands in for a PyBluez BluetoothSocket: once a timeout is set, a recv() that runs
+    out of time raises a plain OSError("timed out"), not socket.timeout."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.timeout = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def settimeout(self, value):
+        self.timeout = value
+
+    def recv(self, size):
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+            try:
+                return self.sock.recv(size)
+            except socket.timeout:
+                raise OSError("timed out")
+        return self.sock.recv(size)
+
+
+def _pair():
+    server, client = socket.socketpair()
+    return TimeoutRaisesOSError(server), client
+
+
+def test_silent_client_is_kept():
+    conn, client = _pair()
+    assert read_hello(conn, timeout=0.05) == (None, b"")
+    client.sendall(b"KEY:a\n")  # the connection is still usable afterwards
+    assert conn.recv(16) == b"KEY:a\n"
+
+
+def test_hello_then_commands():
+    conn, client = _pair()
+    client.sendall(b"HELLO:work\nKEY:a\n")
+    assert read_hello(conn) == ("work", b"KEY:a\n")
+
+
+def test_ordinary_commands_are_returned_unread():
+    conn, client = _pair()
+    client.sendall(b"KEY:a\n")
+    assert read_hello(conn) == (None, b"KEY:a\n")
+
+
+def test_line_split_across_packets():
+    conn, client = _pair()
+
+    def send():
+        client.sendall(b"LANE:ab")
+        time.sleep(0.02)
+        client.sendall(b"cd:pointer\nMOVE:1,0\n")
+
+    threading.Thread(target=send).start()
+    assert read_first_line(conn, "LANE", timeout=1) == ("abcd:pointer", b"MOVE:1,0\n")
+
+
+def test_bytes_already_read_come_first():
+    conn, client = _pair()
+    assert read_hello(conn, timeout=0.05, data=b"HELLO:a\nKEY:x\n") == ("a", b"KEY:x\n")
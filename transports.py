@@ -0,0 +1,194 @@
+"""
+Transports for the relay: where phone connections come from.
+
+  rfcomm    Bluetooth RFCOMM channel 1 with the SPP record (default, needs sudo + PyBluez)
+  tcp       plain TCP line stream (RELAY_TCP_PORT, default 47801), same bytes as RFCOMM
+  loopback  in-process socketpair; connect() hands back the client end (benchmarks, tests)
+
+Every transport yields socket-like connections (recv / sendall / close), so the relay
+loop in laptop_server.py does not care which one it runs on. With --pointer-lane the relay
+also opens pointer_lane(): a second listener of the same kind for each client's pointer
+stream (RFCOMM channel 2 with its own service record, or TCP port + 1).
+"""
+
+import logging
+import os
+import queue
+import socket
+import sys
+
+from protocol import SPP_UUID, POINTER_UUID, RELAY_TCP_PORT
+
+log = logging.getLogger(__name__)
+
+
+class TransportClosed(OSError):
+    """accept() on a transport that was closed; the relay loop stops."""
+
+
+class Transport:
+    """Server side of a transport: open() once, then accept() client connections."""
+
+    name = "base"
+
+    def open(self):
+        """Bind and start listening."""
+
+    def accept(self):
+        """Block until a client connects. Returns (connection, peer info)."""
+        raise NotImplementedError
+
+    def close(self):
+        """Stop listening."""
+
+    def describe(self) -> str:
+        return self.name
+
+    def pointer_lane(self):
+        """A second, unopened transport for clients' pointer streams; None if unsupported."""
+        return None
+
+
+class RfcommTransport(Transport):
+    """Bluetooth RFCOMM with an SPP service record (PyBluez)."""
+
+    name = "rfcomm"
+
+    def __init__(self, channel=1, uuid=SPP_UUID, service_name="KeyboardMouse"):
+        self.channel = channel
+        self.uuid = uuid
+        self.service_name = service_name
+        self.sock = None
+
+    def open(self):
+        try:
+            import bluetooth
+            from bluetooth.btcommon import BluetoothError
+        except ImportError:
+            print("PyBluez is required. Install: pip install PyBluez")
+            print("On Ubuntu/Debian: sudo apt install libbluetooth-dev python3-dev")
+            sys.exit(1)
+
+        self.sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("", self.channel))
+        self.sock.listen(5)  # several phones may connect at once (MPX=1, several sessions)
+
+        try:
+            bluetooth.advertise_service(
+                self.sock,
+                self.service_name,
+                service_id=self.uuid,
+                service_classes=[self.uuid, bluetooth.SERIAL_PORT_CLASS],
+                profiles=[bluetooth.SERIAL_PORT_PROFILE],
+            )
+        except BluetoothError as e:
+            self.sock.close()
+            log.error("Bluetooth error: %s", e)
+            errmsg = str(e).lower()
+            print()
+            if "no advertisable device" in errmsg or "advertisable" in errmsg:
+                print("  Turn Bluetooth ON and make this PC discoverable:")
+                print("    • Settings → Bluetooth → turn ON, then set this device to visible/discoverable")
+                print("  Or from terminal:  bluetoothctl power on && bluetoothctl discoverable on")
+                print()
+            elif "permission denied" in errmsg or "errno 13" in errmsg:
+                print("  Run with sudo:  sudo ./venv/bin/python laptop_server.py --bt")
+            elif "no such file or directory" in errmsg or "errno 2" in errmsg:
+                print("  BlueZ SDP may need: sudo sdptool add SP  and bluetoothd -C")
+            print()
+            sys.exit(1)
+
+    def accept(self):
+        return self.sock.accept()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def describe(self):
+        return f"RFCOMM channel {self.channel}"
+
+    def pointer_lane(self):
+        channel = int(os.environ.get("POINTER_CHANNEL", self.channel + 1))
+        return RfcommTransport(channel, POINTER_UUID, "KeyboardMouse pointer")
+
+
+class TcpTransport(Transport):
+    """Plain TCP carrying the same newline-terminated commands as RFCOMM."""
+
+    name = "tcp"
+
+    def __init__(self, host=None, port=None):
+        self.host = host or os.environ.get("RELAY_TCP_BIND", "127.0.0.1")
+        self.port = int(port if port is not None else os.environ.get("RELAY_TCP_PORT", RELAY_TCP_PORT))
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]  # resolved when port 0 was asked for
+
+    def accept(self):
+        conn, addr = self.sock.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn, addr
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def describe(self):
+        return f"TCP {self.host}:{self.port}"
+
+    def pointer_lane(self):
+        return TcpTransport(self.host, self.port + 1 if self.port else 0)  # ephemeral stays ephemeral
+
+
+class LoopbackTransport(Transport):
+    """In-process stand-in: connect() creates a socketpair and queues the server end for accept()."""
+
+    name = "loopback"
+
+    def __init__(self):
+        self._pending = queue.Queue()
+
+    def connect(self):
+        """Client side: return the client end of a new connection."""
+        server_end, client_end = socket.socketpair()
+        self._pending.put(server_end)
+        return client_end
+
+    def accept(self):
+        conn = self._pending.get()
+        if conn is None:
+            raise TransportClosed("transport closed")
+        return conn, "loopback"
+
+    def close(self):
+        self._pending.put(None)
+
+    def pointer_lane(self):
+        return LoopbackTransport()
+
+
+TRANSPORTS = {
+    "rfcomm": RfcommTransport,
+    "tcp": TcpTransport,
+    "loopback": LoopbackTransport,
+}
+
+
+def transport_from_argv(argv, default="rfcomm") -> Transport:
+    """Build the transport named by --transport=<name> (or $RELAY_TRANSPORT)."""
+    name = os.environ.get("RELAY_TRANSPORT", default)
+    for arg in argv:
+        if arg.startswith("--transport="):
+            name = arg.split("=", 1)[1]
+    name = name.strip().lower()
+    if name not in TRANSPORTS:
+        print(f"Unknown transport {name!r}. Choose one of: {', '.join(TRANSPORTS)}")
+        sys.exit(1)
+    return TRANSPORTS[name]()